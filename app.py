@@ -1,17 +1,368 @@
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from dotenv import load_dotenv
+from config import load_env
 import os
-from scraper import search_and_scrape
-from google_sheets import save_to_sheet
-from quota_manager import check_quota, increment_usage
+import json
+import time
+import metrics
+import parse_pool
+import lead_store
+import warmup
+from quota_manager import check_quota, consume_quota, refund_usage, flush_quota
+from jobs import submit_job, get_job, claim_refund, job_stats, JobQueueFull, shutdown as shutdown_jobs
+from dedup_index import record_delivered
 
-load_dotenv()
+load_env()
+
+# scraper (lxml, requests) and google_sheets (gspread, google-auth) are imported where they
+# are first used, so a cold start can answer /health before they load; see warmup.py
+
+# Run /scrape as a background job unless the request says otherwise
+SCRAPE_ASYNC_DEFAULT = os.getenv('SCRAPE_ASYNC_DEFAULT', 'false').lower() in ('1', 'true', 'yes')
+
+# Longest a single scrape may run; it then finishes with the results collected so far
+SCRAPE_REQUEST_TIMEOUT = float(os.getenv('SCRAPE_REQUEST_TIMEOUT', '240'))  # seconds
+
+# Most niche/location pairs one /scrape/bulk request may ask for
+BULK_MAX_PAIRS = int(os.getenv('BULK_MAX_PAIRS', '50'))
+BULK_REQUEST_TIMEOUT = float(os.getenv('BULK_REQUEST_TIMEOUT', '900'))  # seconds
+
+# Results always go to the local lead store first. Google Sheets is then written as results
+# arrive (inline), by a background job once the search is done (async), or not at all (off).
+SHEETS_EXPORT_MODE = os.getenv('SHEETS_EXPORT_MODE', 'inline').lower()
+SHEETS_EXPORT_MODES = ('inline', 'async', 'off')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
 
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            endpoint=request.url_rule.rule if request.url_rule else 'unmatched',
+            status=response.status_code
+        )
+    return response
+
+def _refund(email: str, amount: int = 1, job_id: str = None) -> None:
+    """Refund searches charged to email; a job's quota is refunded at most once, by whoever claims it first"""
+    if not email:
+        return
+    if job_id is not None and not claim_refund(job_id):
+        return
+    refund_usage(email, amount)
+
+def iter_scrape_pipeline(niche: str, location: str, email: str = None, progress=None,
+                         trace: bool = False, search_id: str = None, sheets: str = None,
+                         job_id: str = None, cancel=None, **search_options):
+    """
+    Search, scrape, store and save to Google Sheets, yielding events as the pipeline runs:
+    {'type': 'result', 'data': ...} per lead, then one 'done' or 'error' event.
+    Each lead is written to the local lead store under search_id (a new id unless given)
+    before anything else; the final event carries search_id and results_url.
+    sheets picks the Sheets export (default SHEETS_EXPORT_MODE): 'inline' appends rows in
+    small batches as results arrive, 'async' queues a job that writes the stored results
+    once the search is done, 'off' skips it. A failed Sheets write leaves the results in the
+    store and is reported as sheet_error.
+    The caller charges the user's quota up front; it is refunded if the search fails, unless
+    the job job_id was already refunded by the server at shutdown. Setting cancel (a
+    threading.Event) stops fetching and ends the run with the results so far.
+    search_options (fanout, localities) are passed on to iter_search_and_scrape.
+    With trace, the final event carries per-stage timings and spans for this run.
+    """
+    tracer = metrics.start_trace() if trace else None
+    try:
+        for event in _iter_pipeline_events(niche, location, email, progress, search_options,
+                                           search_id, sheets or SHEETS_EXPORT_MODE, job_id, cancel):
+            if tracer is not None and event['type'] != 'result':
+                event['trace'] = tracer.summary()
+                print(f"Trace {niche}/{location}: {json.dumps(event['trace']['stages'])}")
+            yield event
+    finally:
+        if tracer is not None:
+            metrics.stop_trace()
+
+def _iter_pipeline_events(niche: str, location: str, email: str, progress, search_options: dict,
+                          search_id: str, sheets: str, job_id: str = None, cancel=None):
+    from scraper import iter_search_and_scrape
+    from google_sheets import SheetWriter
+    search_id = lead_store.create_search(niche, location, email, search_id)
+    lead_store.update_search(search_id, status='running')
+    ids = {'search_id': search_id, 'results_url': f'/results/{search_id}'}
+    writer = SheetWriter(niche, location) if sheets == 'inline' else None
+    sheet_error = None
+    items = []
+    deadline = time.monotonic() + SCRAPE_REQUEST_TIMEOUT if SCRAPE_REQUEST_TIMEOUT > 0 else None
+    try:
+        for item in iter_search_and_scrape(niche, location, progress=progress, email=email,
+                                           deadline=deadline, cancel=cancel, **search_options):
+            # Stored before the sheet write, so a Sheets failure can't lose the lead
+            lead_store.add_results(search_id, niche, location, [item])
+            items.append(item)
+            if writer is not None:
+                try:
+                    writer.add(item)
+                except Exception as e:
+                    sheet_error = str(e)
+                    writer = None
+            yield {'type': 'result', 'data': item}
+        
+        if not items:
+            _refund(email, job_id=job_id)
+            lead_store.update_search(search_id, status='failed', error='No data found', finished_at=time.time())
+            yield {'type': 'error', 'error': 'No data found', 'results_count': 0, **ids}
+            return
+    except Exception as e:
+        _refund(email, job_id=job_id)
+        print(f"Scrape pipeline failed: {str(e)}")
+        lead_store.update_search(search_id, status='failed', error=str(e), finished_at=time.time())
+        yield {'type': 'error', 'error': str(e), 'results_count': len(items), **ids}
+        return
+    
+    if email:
+        record_delivered(email, items)
+    lead_store.update_search(search_id, status='done', finished_at=time.time())
+    
+    done = {'type': 'done', 'sheet_url': None, 'results_count': len(items), **ids}
+    if writer is not None:
+        # Append the last rows and the summary block
+        try:
+            done['sheet_url'] = writer.finish()
+            lead_store.update_search(search_id, sheet_status='done', sheet_url=done['sheet_url'])
+        except Exception as e:
+            sheet_error = str(e)
+    elif sheets == 'async' and sheet_error is None:
+        try:
+            done['sheet_job_id'] = queue_sheet_export(search_id, niche, location)
+        except JobQueueFull as e:
+            sheet_error = str(e)
+    if sheet_error:
+        print(f"Sheets export failed, results kept in the lead store: {sheet_error}")
+        lead_store.update_search(search_id, sheet_status='failed', error=sheet_error)
+        done['sheet_error'] = sheet_error
+    yield done
+
+def run_scrape_pipeline(niche: str, location: str, email: str = None, progress=None,
+                        trace: bool = False, search_id: str = None, sheets: str = None,
+                        job_id: str = None, cancel=None, **search_options) -> dict:
+    """Run the whole pipeline and return its final event (search_id, sheet_url and results_count, or error)"""
+    final = {}
+    for event in iter_scrape_pipeline(niche, location, email, progress=progress, trace=trace,
+                                      search_id=search_id, sheets=sheets, job_id=job_id, cancel=cancel,
+                                      **search_options):
+        if event['type'] != 'result':
+            final = event
+    return final
+
+def run_sheet_export(search_id: str, niche: str, location: str, progress=None, **_job_fields) -> dict:
+    """Write a stored search's results to a new worksheet and record its URL on the search"""
+    from google_sheets import save_to_sheet
+    lead_store.update_search(search_id, sheet_status='running')
+    items = list(lead_store.iter_results(search_id))
+    if not items:
+        lead_store.update_search(search_id, sheet_status='failed')
+        return {'error': 'No stored results', 'results_count': 0}
+    try:
+        sheet_url = save_to_sheet(items, niche, location)
+    except Exception as e:
+        lead_store.update_search(search_id, sheet_status='failed', error=str(e))
+        return {'error': str(e), 'results_count': len(items)}
+    lead_store.update_search(search_id, sheet_status='done', sheet_url=sheet_url, error=None)
+    return {'sheet_url': sheet_url, 'results_count': len(items)}
+
+def queue_sheet_export(search_id: str, niche: str, location: str) -> str:
+    """Queue run_sheet_export as a background job and return its job id; raises JobQueueFull"""
+    # No email on the job: an export that never runs has nothing to refund
+    job_id = submit_job(run_sheet_export, niche, location, search_id=search_id)
+    lead_store.update_search(search_id, sheet_status='queued', sheet_job_id=job_id)
+    return job_id
+
+def run_bulk_sheet_export(search_ids: list, progress=None, **_job_fields) -> dict:
+    """Write several stored searches to one worksheet each, in one batch, and record their URLs"""
+    from google_sheets import save_bulk_to_sheets
+    searches = [search for search in map(lead_store.get_search, search_ids) if search is not None]
+    batches = []
+    for search in searches:
+        lead_store.update_search(search['search_id'], sheet_status='running')
+        batches.append((search['niche'], search['location'], list(lead_store.iter_results(search['search_id']))))
+    results_count = sum(len(items) for _, _, items in batches)
+    try:
+        sheet_urls = save_bulk_to_sheets(batches)
+    except Exception as e:
+        for search in searches:
+            lead_store.update_search(search['search_id'], sheet_status='failed', error=str(e))
+        return {'error': str(e), 'results_count': results_count}
+    for search, sheet_url in zip(searches, sheet_urls):
+        lead_store.update_search(search['search_id'], sheet_status='done', sheet_url=sheet_url, error=None)
+    return {
+        'sheet_url': sheet_urls[0].split('#')[0] if sheet_urls else None,
+        'results_count': results_count,
+        'sheet_urls': {search['search_id']: sheet_url for search, sheet_url in zip(searches, sheet_urls)}
+    }
+
+def run_bulk_pipeline(pairs: list, email: str = None, progress=None, sheets: str = None,
+                      job_id: str = None, cancel=None, **_job_fields) -> dict:
+    """
+    Search, scrape, store and save several niche/location pairs, one worksheet each.
+    Each pair's results are stored as a search of its own first. The worksheets are written
+    together in one batch unless sheets is 'off', or in a background job of their own
+    (sheet_job_id) when it is 'async'; a failed Sheets write is reported as sheet_error and
+    the stored results are kept.
+    The caller charges one search per pair up front; pairs that fail or find nothing are refunded,
+    unless the job job_id was already refunded by the server at shutdown. Setting cancel stops
+    fetching and keeps the results so far.
+    Returns sheet_url and results_count for the batch plus a 'searches' entry per pair, or error.
+    """
+    from scraper import bulk_search_and_scrape
+    from google_sheets import save_bulk_to_sheets
+    deadline = time.monotonic() + BULK_REQUEST_TIMEOUT if BULK_REQUEST_TIMEOUT > 0 else None
+    try:
+        outcomes = bulk_search_and_scrape([tuple(pair) for pair in pairs], email=email,
+                                          progress=progress, deadline=deadline, cancel=cancel)
+        delivered = [outcome for outcome in outcomes if outcome['results']]
+        if not delivered:
+            _refund(email, len(pairs), job_id)
+            return {'error': 'No data found', 'results_count': 0}
+        
+        for outcome in delivered:
+            outcome['search_id'] = lead_store.create_search(outcome['niche'], outcome['location'], email)
+            lead_store.add_results(outcome['search_id'], outcome['niche'], outcome['location'], outcome['results'])
+            lead_store.update_search(outcome['search_id'], status='done', finished_at=time.time())
+    except Exception as e:
+        _refund(email, len(pairs), job_id)
+        print(f"Bulk scrape failed: {str(e)}")
+        return {'error': str(e), 'results_count': 0}
+    
+    if email:
+        if len(delivered) < len(pairs):
+            _refund(email, len(pairs) - len(delivered), job_id)
+        for outcome in delivered:
+            record_delivered(email, outcome['results'])
+    
+    sheet_urls = []
+    sheet_error = None
+    sheet_job_id = None
+    sheets = sheets or SHEETS_EXPORT_MODE
+    if sheets == 'async':
+        search_ids = [outcome['search_id'] for outcome in delivered]
+        try:
+            # No email on the job: an export that never runs has nothing to refund
+            sheet_job_id = submit_job(run_bulk_sheet_export, f'{len(search_ids)} searches', 'bulk sheets',
+                                      search_ids=search_ids)
+            for search_id in search_ids:
+                lead_store.update_search(search_id, sheet_status='queued', sheet_job_id=sheet_job_id)
+        except JobQueueFull as e:
+            sheet_error = str(e)
+    elif sheets != 'off':
+        try:
+            sheet_urls = save_bulk_to_sheets([
+                (outcome['niche'], outcome['location'], outcome['results']) for outcome in delivered
+            ])
+        except Exception as e:
+            sheet_error = str(e)
+            print(f"Bulk Sheets export failed, results kept in the lead store: {sheet_error}")
+    
+    urls = iter(sheet_urls)
+    searches = []
+    for outcome in outcomes:
+        entry = {'niche': outcome['niche'], 'location': outcome['location'], 'results_count': len(outcome['results'])}
+        if outcome['results']:
+            entry['search_id'] = outcome['search_id']
+            entry['results_url'] = f"/results/{outcome['search_id']}"
+            if sheet_urls:
+                entry['sheet_url'] = next(urls)
+                lead_store.update_search(outcome['search_id'], sheet_status='done', sheet_url=entry['sheet_url'])
+            elif sheet_error:
+                lead_store.update_search(outcome['search_id'], sheet_status='failed', error=sheet_error)
+        else:
+            entry['error'] = outcome['error'] or 'No data found'
+        searches.append(entry)
+    
+    result = {
+        'sheet_url': sheet_urls[0].split('#')[0] if sheet_urls else None,
+        'results_count': sum(entry['results_count'] for entry in searches),
+        'searches': searches
+    }
+    if sheet_job_id:
+        result['sheet_job_id'] = sheet_job_id
+    if sheet_error:
+        result['sheet_error'] = sheet_error
+    return result
+
+def _parse_bulk_pairs(raw) -> list:
+    """Read [{'niche', 'location'}] or [[niche, location]] into a list of distinct pairs"""
+    if not isinstance(raw, list) or not raw:
+        raise ValueError('pairs must be a non-empty list of {"niche", "location"} objects')
+    pairs = []
+    seen = set()
+    for entry in raw:
+        if isinstance(entry, dict):
+            niche, location = entry.get('niche'), entry.get('location')
+        elif isinstance(entry, (list, tuple)) and len(entry) == 2:
+            niche, location = entry
+        else:
+            niche = location = None
+        if not isinstance(niche, str) or not isinstance(location, str) or not niche.strip() or not location.strip():
+            raise ValueError(f'Invalid pair: {entry!r}')
+        key = (niche.strip().casefold(), location.strip().casefold())
+        if key not in seen:
+            seen.add(key)
+            pairs.append([niche.strip(), location.strip()])
+    if len(pairs) > BULK_MAX_PAIRS:
+        raise ValueError(f'At most {BULK_MAX_PAIRS} pairs per request')
+    return pairs
+
+def _parse_sheets_mode(raw) -> str:
+    """Read the request's sheets option: a mode name, or true/false for the default mode or off"""
+    if raw is None or raw is True:
+        return SHEETS_EXPORT_MODE
+    if raw is False:
+        return 'off'
+    if isinstance(raw, str) and raw.lower() in SHEETS_EXPORT_MODES:
+        return raw.lower()
+    raise ValueError(f'sheets must be one of {", ".join(SHEETS_EXPORT_MODES)}')
+
+def _export_response(items, filename: str):
+    """Stream items in the ?format= export format (csv by default) as a file download"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in lead_store.EXPORT_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(lead_store.EXPORT_FORMATS)}'}), 400
+    try:
+        chunks = lead_store.iter_export(items, fmt)
+    except lead_store.ExportUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    return Response(chunks, mimetype=EXPORT_MIMETYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'
+    })
+
+def drain_background_work(timeout: float = 30) -> None:
+    """
+    Shutdown hook for the server: let running scrape jobs finish within timeout, cancel and
+    refund the quota of jobs that were dropped or cut off (jobs.shutdown only returns those
+    whose refund it claimed), write out buffered quota usage and stop the parse worker processes.
+    """
+    for job in shutdown_jobs(timeout):
+        print(f"Scrape job {job['job_id']} abandoned at shutdown")
+        if job.get('email'):
+            # Bulk jobs were charged one search per pair
+            refund_usage(job['email'], len(job.get('pairs') or [None]))
+    flush_quota()
+    parse_pool.shutdown()
+
 @app.route('/scrape', methods=['POST'])
 def scrape_endpoint():
     try:
@@ -19,48 +370,148 @@ def scrape_endpoint():
         
         if not data or 'niche' not in data or 'location' not in data:
             return jsonify({'error': 'Missing niche or location in request'}), 400
+        try:
+            sheets = _parse_sheets_mode(data.get('sheets'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Check if email is provided for quota management
+        # The search is charged atomically now so concurrent requests can't overrun the quota
         email = data.get('email')
         if email:
-            can_search, message = check_quota(email)
+            can_search, message = consume_quota(email)
             if not can_search:
                 return jsonify({'error': message}), 429
         
         niche = data['niche']
         location = data['location']
         
-        # Search and scrape
-        scraped_data = search_and_scrape(niche, location)
+        # Optional fan-out: extra query variants, result pages and nearby localities
+        search_options = {'fanout': data.get('fanout'), 'sheets': sheets}
+        localities = data.get('localities')
+        if isinstance(localities, list):
+            search_options['localities'] = [str(locality) for locality in localities][:10]
+            search_options['fanout'] = True
         
-        if not scraped_data:
-            return jsonify({'error': 'No data found'}), 404
+        # Opt-in trace: per-stage timings for this request in the final result
+        search_options['trace'] = bool(data.get('trace')) or request.headers.get('X-Trace') == '1'
         
-        # Save to Google Sheets
-        sheet_url = save_to_sheet(scraped_data, niche, location)
+        # Job mode: queue the pipeline and return a job id straight away
+        if data.get('async', SCRAPE_ASYNC_DEFAULT):
+            search_id = lead_store.new_search_id()
+            try:
+                job_id = submit_job(run_scrape_pipeline, niche, location, email, search_id=search_id, **search_options)
+            except JobQueueFull as e:
+                if email:
+                    refund_usage(email)
+                response = jsonify({'error': str(e)})
+                response.headers['Retry-After'] = '30'
+                return response, 503
+            # Recorded now so the results URL answers while the job waits in the queue
+            lead_store.create_search(niche, location, email, search_id, status='queued')
+            
+            return jsonify({
+                'status': 'queued',
+                'job_id': job_id,
+                'status_url': f'/jobs/{job_id}',
+                'search_id': search_id,
+                'results_url': f'/results/{search_id}',
+                'meta_url': f'/results/{search_id}/meta'
+            }), 202
         
-        # Increment usage count if email provided
-        if email:
-            increment_usage(email)
+        # Streaming mode: one NDJSON line per lead as soon as it is scraped
+        if data.get('stream'):
+            def generate():
+                for event in iter_scrape_pipeline(niche, location, email, **search_options):
+                    yield json.dumps(event) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
         
+        result = run_scrape_pipeline(niche, location, email, **search_options)
+        
+        trace = {'trace': result['trace']} if 'trace' in result else {}
+        if result.get('error') == 'No data found':
+            return jsonify({'error': result['error'], **trace}), 404
+        if result.get('error'):
+            return jsonify({'error': result['error'], **trace}), 500
+        
+        extra = {key: result[key] for key in ('sheet_error', 'sheet_job_id', 'trace') if key in result}
         return jsonify({
             'status': 'success',
-            'sheet_url': sheet_url,
-            'results_count': len(scraped_data)
+            'search_id': result['search_id'],
+            'results_url': result['results_url'],
+            'sheet_url': result['sheet_url'],
+            'results_count': result['results_count'],
+            **extra
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/scrape/bulk', methods=['POST'])
+def scrape_bulk_endpoint():
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': 'Missing pairs in request'}), 400
+        try:
+            pairs = _parse_bulk_pairs(data.get('pairs'))
+            sheets = _parse_sheets_mode(data.get('sheets'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # The whole batch is charged in one transaction: all pairs fit in the quota or none run
+        email = data.get('email')
+        if email:
+            can_search, message = consume_quota(email, len(pairs))
+            if not can_search:
+                return jsonify({'error': message}), 429
+        
+        if data.get('async', SCRAPE_ASYNC_DEFAULT):
+            try:
+                job_id = submit_job(run_bulk_pipeline, f'{len(pairs)} searches', 'bulk', email, pairs=pairs, sheets=sheets)
+            except JobQueueFull as e:
+                if email:
+                    refund_usage(email, len(pairs))
+                response = jsonify({'error': str(e)})
+                response.headers['Retry-After'] = '30'
+                return response, 503
+            
+            return jsonify({
+                'status': 'queued',
+                'job_id': job_id,
+                'status_url': f'/jobs/{job_id}'
+            }), 202
+        
+        result = run_bulk_pipeline(pairs, email, sheets=sheets)
+        
+        if result.get('error') == 'No data found':
+            return jsonify({'error': result['error']}), 404
+        if result.get('error'):
+            return jsonify({'error': result['error']}), 500
+        
+        return jsonify({'status': 'success', **result})
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/', methods=['GET'])
 def root():
     return jsonify({
         'message': 'Lead Scraper API',
         'version': '1.0',
         'endpoints': {
-            'POST /scrape': 'Main scraping endpoint - requires niche, location, and optional email',
+            'POST /scrape': 'Main scraping endpoint - requires niche, location, and optional email, async, stream, fanout, localities, trace and sheets (inline, async or off)',
+            'POST /scrape/bulk': 'Several searches at once - requires pairs [{niche, location}], optional email, async and sheets',
+            'GET /results/<search_id>': 'Download a search\'s stored results - optional format (csv, ndjson or parquet)',
+            'GET /results/<search_id>/meta': 'Status of a search and its Sheets export (sheet_status, sheet_url, sheet_job_id)',
+            'POST /results/<search_id>/sheet': 'Write a search\'s stored results to a new worksheet in the background',
+            'GET /jobs/<job_id>': 'Status, progress, sheet_url and full result (per-search entries for bulk jobs) of an async job',
             'GET /quota/<email>': 'Check quota status for user',
-            'GET /health': 'Health check endpoint'
+            'GET /health': 'Health check endpoint',
+            'GET /stats': 'Runtime statistics (HTTP connection pool reuse, scrape and search cache hits, throttled domains, dedup index, parse workers, job queue, lead store, warm-up)',
+            'GET /stats/domains': 'Per-domain health: failures, timeouts, latency and skipped (circuit open) domains',
+            'GET /metrics': 'Prometheus metrics: per-stage timing histograms, page sizes, API call counts'
         },
         'example_usage': {
             'scrape': {
@@ -79,6 +530,79 @@ def root():
 def health_check():
     return jsonify({'status': 'healthy'})
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Get status, progress and result of a queued scrape"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/results/<search_id>', methods=['GET'])
+def search_results(search_id):
+    """Stream a search's stored results as CSV, NDJSON or Parquet"""
+    if lead_store.get_search(search_id) is None:
+        return jsonify({'error': 'Search not found'}), 404
+    return _export_response(lead_store.iter_results(search_id), f'leads_{search_id}')
+
+@app.route('/results/<search_id>/meta', methods=['GET'])
+def search_meta(search_id):
+    """Get a search's status and counts, and whether and where its Sheets export landed"""
+    search = lead_store.get_search(search_id)
+    if search is None:
+        return jsonify({'error': 'Search not found'}), 404
+    search['results_url'] = f'/results/{search_id}'
+    return jsonify(search)
+
+@app.route('/results/<search_id>/sheet', methods=['POST'])
+def export_results_to_sheet(search_id):
+    """Queue a Sheets export of a search's stored results, e.g. after an inline write failed"""
+    search = lead_store.get_search(search_id)
+    if search is None:
+        return jsonify({'error': 'Search not found'}), 404
+    if search['status'] != 'done':
+        return jsonify({'error': f"Search is {search['status']}"}), 409
+    try:
+        job_id = queue_sheet_export(search_id, search['niche'], search['location'])
+    except JobQueueFull as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    return jsonify({'status': 'queued', 'job_id': job_id, 'status_url': f'/jobs/{job_id}'}), 202
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Expose pipeline metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Get runtime statistics for the scraper"""
+    from http_client import pool_stats
+    import scrape_cache
+    import search_cache
+    from politeness import politeness_stats
+    from domain_health import domain_stats
+    from dedup_index import index_stats
+    return jsonify({
+        'http_pool': pool_stats(),
+        'scrape_cache': scrape_cache.cache_stats(),
+        'search_cache': search_cache.cache_stats(),
+        'politeness': politeness_stats(),
+        'domain_health': domain_stats(include_domains=False),
+        'dedup': index_stats(),
+        'parse_pool': parse_pool.pool_stats(),
+        'jobs': job_stats(),
+        'lead_store': lead_store.store_stats(),
+        'warmup': warmup.warmup_status()
+    })
+
+@app.route('/stats/domains', methods=['GET'])
+def domain_health_stats():
+    """Get the per-domain health registry"""
+    from domain_health import domain_stats
+    return jsonify(domain_stats())
+
 @app.route('/quota/<email>', methods=['GET'])
 def get_quota_status(email):
     """Get user's quota status"""
@@ -97,4 +621,7 @@ def get_quota_status(email):
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
+    # With the debug reloader only the child process that serves requests warms up
+    if warmup.WARMUP_ENABLED and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warmup.start_warmup()
     app.run(host='0.0.0.0', port=8080, debug=True)
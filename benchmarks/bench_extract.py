@@ -0,0 +1,135 @@
+"""
+Benchmark extract_contact_info against the previous BeautifulSoup implementation.
+
+Runs both extractors over a corpus of saved HTML pages, checks that they return the
+same contact info for every page and reports the time per page.
+
+    python benchmarks/bench_extract.py
+    python benchmarks/bench_extract.py --pages /path/to/saved/pages --scale 50 --rounds 20
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from typing import Dict, List
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import extract_contact_info  # noqa: E402
+
+DEFAULT_PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+def legacy_extract_contact_info(html_content: str, url: str) -> Dict:
+    """extract_contact_info as it was before the single-pass extractor"""
+    soup = BeautifulSoup(html_content, 'lxml')
+
+    text = soup.get_text()
+
+    common_spam_domains = ['example.com', 'test.com', 'dummy.com', 'noreply', 'support', 'info']
+
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+    emails = list(set(
+        email for email in re.findall(email_pattern, text)
+        if not any(bad in email.lower() for bad in common_spam_domains)
+    ))
+
+    phone_patterns = [
+        r'\+91[-\s]?[6-9]\d{9}',
+        r'91[-\s]?[6-9]\d{9}',
+        r'[6-9]\d{9}',
+        r'\([0-9]{3}\)[-\s]?[0-9]{3}[-\s]?[0-9]{4}'
+    ]
+
+    phones = []
+    for pattern in phone_patterns:
+        phones.extend(re.findall(pattern, text))
+
+    cleaned_phones = list(set([
+        phone for phone in phones
+        if len(phone) >= 10 and not re.match(r'(\d)\1{5,}', phone)
+    ]))
+
+    social_pattern = r'https?://(?:www\.)?(?:facebook|instagram)\.com/[^\s<>"]*'
+    social_links = list(set(re.findall(social_pattern, html_content)))
+
+    return {
+        'url': url,
+        'emails': emails,
+        'phones': cleaned_phones,
+        'social_links': {
+            'facebook': [link for link in social_links if 'facebook.com' in link],
+            'instagram': [link for link in social_links if 'instagram.com' in link]
+        }
+    }
+
+def scale_page(html: str, scale: int) -> str:
+    """Repeat the page body so large pages can be simulated from small saved ones"""
+    match = re.search(r'(<body[^>]*>)(.*?)(</body>)', html, re.DOTALL | re.IGNORECASE)
+    if not match:
+        return html * scale
+    return html[:match.start(2)] + match.group(2) * scale + html[match.end(2):]
+
+def load_pages(pages_dir: str, scale: int) -> List[tuple]:
+    """Load saved pages; scale > 1 also adds a copy of each page with its body repeated"""
+    pages = []
+    for name in sorted(os.listdir(pages_dir)):
+        if not name.endswith(('.html', '.htm')):
+            continue
+        with open(os.path.join(pages_dir, name), encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        pages.append((name, html))
+        if scale > 1:
+            pages.append((f"{name} x{scale}", scale_page(html, scale)))
+    return pages
+
+def _canonical(result: Dict) -> Dict:
+    return {
+        'url': result['url'],
+        'emails': sorted(result['emails']),
+        'phones': sorted(result['phones']),
+        'social_links': {k: sorted(v) for k, v in result['social_links'].items()}
+    }
+
+def time_extractor(extractor, html: str, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        extractor(html, 'https://bench.local/')
+    return (time.perf_counter() - start) / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', default=DEFAULT_PAGES_DIR, help='directory of saved .html pages')
+    parser.add_argument('--scale', type=int, default=50, help='also test each page repeated this many times')
+    parser.add_argument('--rounds', type=int, default=20, help='timed runs per page')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.scale)
+    if not pages:
+        print(f"No .html pages found in {args.pages}")
+        return 1
+
+    mismatches = 0
+    total_legacy = 0.0
+    total_new = 0.0
+
+    print(f"{'page':<32} {'size':>9} {'legacy ms':>10} {'new ms':>9} {'speedup':>8}")
+    for name, html in pages:
+        if _canonical(legacy_extract_contact_info(html, name)) != _canonical(extract_contact_info(html, name)):
+            mismatches += 1
+            print(f"MISMATCH: {name}")
+
+        legacy = time_extractor(legacy_extract_contact_info, html, args.rounds)
+        new = time_extractor(extract_contact_info, html, args.rounds)
+        total_legacy += legacy
+        total_new += new
+        print(f"{name:<32} {len(html):>9} {legacy * 1000:>10.2f} {new * 1000:>9.2f} {legacy / new:>7.1f}x")
+
+    print(f"\nTotal: legacy {total_legacy * 1000:.2f} ms, new {total_new * 1000:.2f} ms "
+          f"({total_legacy / total_new:.1f}x faster), {mismatches} mismatching page(s)")
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Benchmark the search -> scrape -> sheet pipeline end to end without external services.
+
+Starts a fake Serper endpoint and a local page server (benchmarks/local_services.py),
+points the scraper at them, swaps the Google spreadsheet for an in-memory stand-in and
+runs search_and_scrape + save_to_sheet for a number of searches. Reports searches/sec,
+page fetches/sec, p50/p95 search latency and peak memory.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --searches 20 --concurrency 4 --latency-ms 150 --error-rate 0.05
+    python benchmarks/bench_pipeline.py --page-kb 300 --sheets-latency-ms 400 --json
+    python benchmarks/bench_pipeline.py --concurrency 4 --page-kb 500 --parse-workers 4
+
+Every result url is its own site on a 127.0.x.y loopback address, so this needs Linux
+(or another OS that routes all of 127.0.0.0/8 to loopback).
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from local_services import FakeSerperServer, InMemorySpreadsheet, PageServer, load_corpus  # noqa: E402
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def configure_environment(serper_url: str, data_dir: str, use_cache: bool, parse_workers: int = 0) -> None:
+    """Point the pipeline at the local services; must run before the app modules are imported"""
+    os.environ['SERPER_API_URL'] = serper_url
+    os.environ['SERPER_API_KEY'] = 'bench'
+    os.environ['SCRAPE_CACHE_ENABLED'] = 'true' if use_cache else 'false'
+    os.environ['SCRAPE_CACHE_PATH'] = os.path.join(data_dir, 'scrape_cache.db')
+    os.environ['DEDUP_DB_PATH'] = os.path.join(data_dir, 'leads_index.db')
+    os.environ['JOBS_DB_PATH'] = os.path.join(data_dir, 'jobs.db')
+    os.environ['QUOTA_DB_PATH'] = os.path.join(data_dir, 'users.db')
+    os.environ['PARSE_POOL_ENABLED'] = 'true' if parse_workers else 'false'
+    if parse_workers:
+        os.environ['PARSE_POOL_WORKERS'] = str(parse_workers)
+
+def run_search(index: int, location: str) -> Dict:
+    from scraper import search_and_scrape
+    from google_sheets import save_to_sheet
+
+    niche = f"bench niche {index}"
+    started = time.perf_counter()
+    results = search_and_scrape(niche, location)
+    scraped = time.perf_counter()
+    save_to_sheet(results, niche, location)
+    finished = time.perf_counter()
+    return {
+        'results': len(results),
+        'errors': sum(1 for item in results if 'error' in item),
+        'scrape_seconds': scraped - started,
+        'sheet_seconds': finished - scraped,
+        'seconds': finished - started
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--searches', type=int, default=10, help='searches to run (default 10)')
+    parser.add_argument('--concurrency', type=int, default=1, help='searches run at once (default 1)')
+    parser.add_argument('--urls-per-search', type=int, default=50)
+    parser.add_argument('--junk-rate', type=float, default=0.1, help='share of social media result urls')
+    parser.add_argument('--latency-ms', type=float, default=50, help='mean page response delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of page requests answered with 500')
+    parser.add_argument('--page-kb', type=float, default=0, help='pad pages up to this size')
+    parser.add_argument('--serper-latency-ms', type=float, default=300)
+    parser.add_argument('--sheets-latency-ms', type=float, default=250, help='delay per Sheets API call')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='parse pages in this many worker processes (default 0: in the scrape threads)')
+    parser.add_argument('--with-cache', action='store_true', help='keep the on-disk scrape cache enabled')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also report peak Python heap via tracemalloc (slows the run down)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    pages = PageServer(load_corpus(), latency_ms=args.latency_ms, error_rate=args.error_rate,
+                       page_kb=args.page_kb).start()
+    serper = FakeSerperServer(pages.port, urls_per_search=args.urls_per_search,
+                              junk_rate=args.junk_rate, latency_ms=args.serper_latency_ms).start()
+    data_dir = tempfile.mkdtemp(prefix='leadscraper-bench-')
+    configure_environment(serper.url, data_dir, args.with_cache, args.parse_workers)
+
+    import google_sheets
+    spreadsheet = InMemorySpreadsheet(latency_ms=args.sheets_latency_ms)
+    google_sheets.get_spreadsheet = lambda: spreadsheet
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        runs = list(executor.map(lambda index: run_search(index, 'Bench City'), range(args.searches)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [run['seconds'] for run in runs]
+    report = {
+        'searches': args.searches,
+        'concurrency': args.concurrency,
+        'parse_workers': args.parse_workers,
+        'wall_seconds': round(elapsed, 3),
+        'searches_per_sec': round(args.searches / elapsed, 3),
+        'page_requests': pages.requests,
+        'page_requests_per_sec': round(pages.requests / elapsed, 1),
+        'page_errors_served': pages.errors,
+        'mb_downloaded': round(pages.bytes_sent / 1024 / 1024, 2),
+        'serper_requests': serper.requests,
+        'sheets_calls': spreadsheet.calls + sum(sheet.calls for sheet in spreadsheet.worksheets()),
+        'results_per_search': round(sum(run['results'] for run in runs) / max(len(runs), 1), 1),
+        'latency_p50': round(percentile(latencies, 50), 3),
+        'latency_p95': round(percentile(latencies, 95), 3),
+        'latency_max': round(max(latencies, default=0.0), 3),
+        'scrape_p50': round(percentile([run['scrape_seconds'] for run in runs], 50), 3),
+        'sheet_p50': round(percentile([run['sheet_seconds'] for run in runs], 50), 3),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+    if args.trace_memory:
+        report['peak_heap_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+
+    pages.stop()
+    serper.stop()
+    if args.parse_workers:
+        import parse_pool
+        parse_pool.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print()
+    print(f"{args.searches} searches, concurrency {args.concurrency}: {elapsed:.2f}s "
+          f"({report['searches_per_sec']} searches/s)")
+    print(f"  page fetches     {report['page_requests']} ({report['page_requests_per_sec']}/s, "
+          f"{report['page_errors_served']} errors served, {report['mb_downloaded']} MB)")
+    print(f"  results/search   {report['results_per_search']}")
+    print(f"  search latency   p50 {report['latency_p50']}s  p95 {report['latency_p95']}s  "
+          f"max {report['latency_max']}s  (scrape p50 {report['scrape_p50']}s, sheet p50 {report['sheet_p50']}s)")
+    print(f"  API calls        serper {report['serper_requests']}, sheets {report['sheets_calls']}")
+    print(f"  peak RSS         {report['peak_rss_mb']} MB"
+          + (f", peak heap {report['peak_heap_mb']} MB" if args.trace_memory else ''))
+
+if __name__ == '__main__':
+    main()
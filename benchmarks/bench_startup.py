@@ -0,0 +1,157 @@
+"""
+Measure cold-start cost: how long `import app` takes, how soon /health answers and how
+long the first /scrape takes, in fresh interpreters.
+
+Each mode runs in its own subprocess, a few times over:
+  eager   scraper and google_sheets imported up front, as app.py used to
+  lazy    app.py as it is: heavy modules load during the first /scrape
+  warm    lazy, plus the background warm-up (warmup.py) finishing before the first /scrape
+
+The first /scrape runs against the local Serper and page stand-ins from local_services.py.
+Opening the spreadsheet sleeps --sheets-open-ms once per process, standing in for the
+service account authorization and open_by_key round trips.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --sheets-open-ms 800 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+MODES = ('eager', 'lazy', 'warm')
+HEAVY_MODULES = ('lxml', 'requests', 'gspread', 'google.oauth2')
+
+def run_child(mode: str, serper_url: str, sheets_open_ms: float) -> Dict:
+    """Runs in the subprocess: time the import, /health and the first /scrape"""
+    from bench_pipeline import configure_environment
+    configure_environment(serper_url, tempfile.mkdtemp(prefix='leadscraper-startup-'), use_cache=False)
+    os.environ['LEAD_STORE_PATH'] = os.path.join(os.path.dirname(os.environ['JOBS_DB_PATH']), 'leads.db')
+    os.environ['WARMUP_ENABLED'] = 'true' if mode == 'warm' else 'false'
+
+    started = time.perf_counter()
+    if mode == 'eager':
+        import scraper  # noqa: F401
+        import google_sheets  # noqa: F401
+    import app
+    import_seconds = time.perf_counter() - started
+    heavy_loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    client = app.app.test_client()
+    request_started = time.perf_counter()
+    client.get('/health')
+    health_seconds = time.perf_counter() - request_started
+
+    def patch_sheets():
+        # Imports google_sheets, so it counts towards whatever step runs it
+        import google_sheets
+        from local_services import InMemorySpreadsheet
+        spreadsheet = InMemorySpreadsheet()
+        opened = []
+
+        def get_spreadsheet():
+            if not opened:
+                time.sleep(sheets_open_ms / 1000)
+                opened.append(True)
+            return spreadsheet
+        google_sheets.get_spreadsheet = get_spreadsheet
+
+    warmup_seconds = None
+    if mode == 'warm':
+        import warmup
+        warmup_started = time.perf_counter()
+        warmup.WARMUP_STEPS.insert(0, ('bench_sheets_stand_in', patch_sheets))
+        warmup.start_warmup()
+        warmup.wait_for_warmup()
+        warmup_seconds = time.perf_counter() - warmup_started
+
+    request_started = time.perf_counter()
+    if mode != 'warm':
+        patch_sheets()
+    response = client.post('/scrape', json={'niche': 'startup bench', 'location': 'Bench City'})
+    scrape_seconds = time.perf_counter() - request_started
+
+    return {
+        'mode': mode,
+        'import_seconds': import_seconds,
+        'heavy_modules_at_import': heavy_loaded,
+        'first_health_seconds': health_seconds,
+        'warmup_seconds': warmup_seconds,
+        'first_scrape_seconds': scrape_seconds,
+        'first_scrape_status': response.status_code
+    }
+
+def median(values: List[float]) -> float:
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return ordered[middle] if len(ordered) % 2 else (ordered[middle - 1] + ordered[middle]) / 2
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='fresh interpreters per mode (default 3)')
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated modes to run')
+    parser.add_argument('--latency-ms', type=float, default=20, help='mean page response delay')
+    parser.add_argument('--serper-latency-ms', type=float, default=100)
+    parser.add_argument('--sheets-open-ms', type=float, default=500,
+                        help='one-off delay standing in for Sheets authorization (default 500)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--serper-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Scrape progress goes to stderr so the report line is the only thing on stdout
+        real_stdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = run_child(args.child, args.serper_url, args.sheets_open_ms)
+        real_stdout.write(json.dumps(result) + '\n')
+        return
+
+    from local_services import FakeSerperServer, PageServer, load_corpus
+    pages = PageServer(load_corpus(), latency_ms=args.latency_ms).start()
+    serper = FakeSerperServer(pages.port, latency_ms=args.serper_latency_ms).start()
+
+    report = {}
+    for mode in args.modes.split(','):
+        runs = []
+        for _ in range(max(1, args.runs)):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', mode, '--serper-url', serper.url,
+                 '--sheets-open-ms', str(args.sheets_open_ms)],
+                check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        report[mode] = {
+            'import_ms': round(median([run['import_seconds'] for run in runs]) * 1000, 1),
+            'first_health_ms': round(median([run['first_health_seconds'] for run in runs]) * 1000, 1),
+            'first_scrape_ms': round(median([run['first_scrape_seconds'] for run in runs]) * 1000, 1),
+            'warmup_ms': round(median([run['warmup_seconds'] for run in runs]) * 1000, 1)
+            if mode == 'warm' else None,
+            'heavy_modules_at_import': runs[0]['heavy_modules_at_import'],
+            'scrape_statuses': sorted({run['first_scrape_status'] for run in runs})
+        }
+
+    pages.stop()
+    serper.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Median of {args.runs} fresh interpreters per mode")
+    print(f"  {'mode':<6} {'import':>9} {'/health':>9} {'warm-up':>9} {'1st scrape':>11}  heavy modules at import")
+    for mode, row in report.items():
+        warmup_ms = f"{row['warmup_ms']}ms" if row['warmup_ms'] is not None else '-'
+        print(f"  {mode:<6} {row['import_ms']:>7}ms {row['first_health_ms']:>7}ms {warmup_ms:>9} "
+              f"{row['first_scrape_ms']:>9}ms  {', '.join(row['heavy_modules_at_import']) or 'none'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Local stand-ins for the services the pipeline talks to, for offline benchmarks.
+
+FakeSerperServer  answers POST /search like google.serper.dev, with generated result urls
+PageServer        serves the saved business pages with injectable latency, errors and sizes
+InMemorySpreadsheet / InMemoryWorksheet
+                  cover the part of gspread's Spreadsheet/Worksheet API that google_sheets uses
+
+Result urls point at distinct loopback addresses (127.0.x.y) so every result is its own
+domain, as it would be in real search results; the page server listens on all of them.
+That relies on the whole 127.0.0.0/8 block routing to loopback, which Linux does by default.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+def load_corpus(pages_dir: str = PAGES_DIR) -> List[str]:
+    corpus = []
+    for name in sorted(os.listdir(pages_dir)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(pages_dir, name), encoding='utf-8') as f:
+                corpus.append(f.read())
+    if not corpus:
+        raise ValueError(f"No .html pages found in {pages_dir}")
+    return corpus
+
+def site_host(index: int) -> str:
+    """Loopback address standing in for the index'th distinct site"""
+    return f"127.0.{index // 250 + 1}.{index % 250 + 1}"
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class _LocalServer:
+    handler = _Handler
+
+    def __init__(self, bind: str = '127.0.0.1', port: int = 0):
+        self.server = _QuietServer((bind, port), self.handler)
+        self.server.owner = self
+        self.port = self.server.server_port
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+class _PageHandler(_Handler):
+    def do_GET(self):
+        owner = self.server.owner
+        owner.count_request()
+        status, body = owner.render(self.path, self.headers.get('Host', ''))
+        self.send_body(status, 'text/html; charset=utf-8', body)
+
+class PageServer(_LocalServer):
+    """
+    Serves a corpus page for every path. Each site gets its own contact email so the
+    pipeline's contact dedup sees distinct businesses.
+    latency_ms is the mean response delay (uniform +/-50%), error_rate the share of
+    requests answered with a 500, and page_kb the size pages are padded up to.
+    """
+    handler = _PageHandler
+
+    def __init__(self, corpus: List[str], latency_ms: float = 0, error_rate: float = 0,
+                 page_kb: float = 0, bind: str = '0.0.0.0', seed: int = 1):
+        super().__init__(bind=bind)
+        self.corpus = corpus
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.page_kb = page_kb
+        self.errors = 0
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def _draw(self):
+        with self._random_lock:
+            return self._random.random(), self._random.random()
+
+    def render(self, path: str, host: str):
+        error_draw, latency_draw = self._draw()
+        if self.latency_ms:
+            time.sleep(self.latency_ms * (0.5 + latency_draw) / 1000)
+        if error_draw < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return 500, b'<html><body>Internal Server Error</body></html>'
+
+        site = host.split(':')[0]
+        digest = int(hashlib.md5((site + path).encode()).hexdigest(), 16)
+        page = self.corpus[digest % len(self.corpus)]
+        marker = f'<p>Write to owner.{digest % 100000}@{site.replace(".", "-")}.bench.net</p>'
+        page = re.sub(r'</body>', marker + '</body>', page, count=1, flags=re.IGNORECASE) \
+            if re.search(r'</body>', page, re.IGNORECASE) else page + marker
+
+        target = int(self.page_kb * 1024)
+        if len(page) < target:
+            # Pad with text-free markup so page size grows without changing the contacts found
+            filler = '<div class="row"><span></span></div>\n'
+            page = page.replace('</body>', filler * ((target - len(page)) // len(filler) + 1) + '</body>', 1)
+
+        body = page.encode('utf-8')
+        with self._lock:
+            self.bytes_sent += len(body)
+        return 200, body
+
+class _SerperHandler(_Handler):
+    def do_POST(self):
+        owner = self.server.owner
+        owner.count_request()
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        if owner.latency_ms:
+            time.sleep(owner.latency_ms / 1000)
+        organic = [{'link': link, 'title': link} for link in owner.results_for(payload)]
+        self.send_body(200, 'application/json', json.dumps({'organic': organic}).encode('utf-8'))
+
+class FakeSerperServer(_LocalServer):
+    """
+    Answers Serper searches with urls_per_search links on the page server. Every query and
+    page gets its own block of sites; junk_rate of the links are social media urls that the
+    pipeline filters out without fetching.
+    """
+    handler = _SerperHandler
+
+    def __init__(self, page_port: int, urls_per_search: int = 50, junk_rate: float = 0.1,
+                 latency_ms: float = 0, max_sites: int = 60000):
+        super().__init__()
+        self.page_port = page_port
+        self.urls_per_search = urls_per_search
+        self.junk_rate = junk_rate
+        self.latency_ms = latency_ms
+        self.max_sites = max_sites
+        self._blocks = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/search"
+
+    def results_for(self, payload: Dict) -> List[str]:
+        key = (payload.get('q', ''), int(payload.get('page', 1)))
+        with self._lock:
+            block = self._blocks.setdefault(key, len(self._blocks))
+        rng = random.Random(int(hashlib.md5(repr(key).encode()).hexdigest(), 16))
+        links = []
+        for i in range(min(int(payload.get('num', 10)), self.urls_per_search)):
+            if rng.random() < self.junk_rate:
+                links.append(f"https://www.facebook.com/business{block}_{i}")
+                continue
+            site = (block * self.urls_per_search + i) % self.max_sites
+            links.append(f"http://{site_host(site)}:{self.page_port}/")
+        return links
+
+class InMemoryWorksheet:
+    """The gspread Worksheet calls google_sheets makes, kept in memory"""
+
+    def __init__(self, title: str, rows: int = 1000, cols: int = 26, sheet_id: int = 0,
+                 latency_ms: float = 0):
+        self.title = title
+        self.id = sheet_id
+        self.row_count = rows
+        self.col_count = cols
+        self.rows = []
+        self.calls = 0
+        self.latency_ms = latency_ms
+
+    def _call(self) -> None:
+        self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def append_rows(self, values, value_input_option=None, table_range=None, **kwargs):
+        self._call()
+        self.rows.extend([list(row) for row in values])
+        self.row_count = max(self.row_count, len(self.rows))
+        return {'updates': {'updatedRows': len(values)}}
+
+    def clear(self):
+        self._call()
+        self.rows = []
+
+    def get_all_values(self):
+        self._call()
+        return [list(row) for row in self.rows]
+
+class InMemorySpreadsheet:
+    """The gspread Spreadsheet calls google_sheets makes, kept in memory"""
+
+    def __init__(self, latency_ms: float = 0, url: str = 'https://docs.google.com/spreadsheets/d/bench'):
+        self.url = url
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._worksheets = [InMemoryWorksheet('Sheet1', latency_ms=latency_ms)]
+        self._lock = threading.Lock()
+
+    def _call(self) -> None:
+        with self._lock:
+            self.calls += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    @property
+    def sheet1(self) -> InMemoryWorksheet:
+        return self._worksheets[0]
+
+    def worksheets(self) -> List[InMemoryWorksheet]:
+        return list(self._worksheets)
+
+    def add_worksheet(self, title: str, rows: int, cols: int, index: Optional[int] = None):
+        self._call()
+        with self._lock:
+            worksheet = InMemoryWorksheet(title, rows, cols, sheet_id=len(self._worksheets),
+                                          latency_ms=self.latency_ms)
+            self._worksheets.append(worksheet)
+        return worksheet
+
+    def batch_update(self, body: Dict):
+        self._call()
+        replies = []
+        for request in body.get('requests', []):
+            if 'addSheet' in request:
+                properties = request['addSheet']['properties']
+                grid = properties.get('gridProperties', {})
+                with self._lock:
+                    worksheet = InMemoryWorksheet(properties['title'], grid.get('rowCount', 1000),
+                                                  grid.get('columnCount', 26), sheet_id=len(self._worksheets),
+                                                  latency_ms=self.latency_ms)
+                    self._worksheets.append(worksheet)
+                replies.append({'addSheet': {'properties': {'sheetId': worksheet.id, 'title': worksheet.title}}})
+            else:
+                replies.append({})
+        return {'replies': replies}
+
+    def values_batch_update(self, body: Dict):
+        self._call()
+        by_title = {worksheet.title: worksheet for worksheet in self._worksheets}
+        for update in body.get('data', []):
+            title = update['range'].split('!')[0].strip("'")
+            if title in by_title:
+                by_title[title].rows.extend([list(row) for row in update.get('values', [])])
+        return {'totalUpdatedRows': sum(len(update.get('values', [])) for update in body.get('data', []))}
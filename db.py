@@ -0,0 +1,20 @@
+import os
+import sqlite3
+from config import load_env
+
+load_env()
+
+# Settings shared by every local SQLite store: quota, jobs, lead store, dedup index and scrape cache
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '30'))  # seconds to wait on another writer's lock
+
+def connect_db(path: str, shared: bool = True) -> sqlite3.Connection:
+    """
+    Open a SQLite database in autocommit mode with WAL and synchronous=NORMAL, waiting up to
+    SQLITE_BUSY_TIMEOUT for locks held by other threads and worker processes.
+    A shared connection may be used from any thread, so callers serialize access with a lock;
+    pass shared=False for a connection kept per thread.
+    """
+    conn = sqlite3.connect(path, check_same_thread=not shared, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
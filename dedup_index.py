@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+from config import load_env
+from db import connect_db
+from url_utils import normalize_domain
+
+load_env()
+
+# Persistent index of leads delivered to each customer, keyed by domain and contact fingerprint
+DEDUP_DB_PATH = os.getenv('DEDUP_DB_PATH', 'leads_index.db')
+# What to do with leads a customer has already received: off, mark or skip
+DEDUP_DELIVERED_MODE = os.getenv('DEDUP_DELIVERED_MODE', 'off').lower()
+
+_conn = None
+_lock = threading.Lock()
+_stats = {'duplicate_domains': 0, 'duplicate_contacts': 0, 'delivered_hits': 0}
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = connect_db(DEDUP_DB_PATH)
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS deliveries (
+                email TEXT NOT NULL,
+                key TEXT NOT NULL,
+                delivered_at REAL NOT NULL,
+                PRIMARY KEY (email, key)
+            )
+        ''')
+    return _conn
+
+def contact_fingerprint(result: Dict) -> Optional[str]:
+    """Hash a lead's emails and phone numbers, so one business is recognised on any domain"""
+    emails = sorted({email.strip().lower() for email in result.get('emails', [])})
+    # Compare phones on their last 10 digits so +91/0 prefixes and punctuation don't matter
+    phones = sorted({re.sub(r'\D', '', phone)[-10:] for phone in result.get('phones', [])})
+    phones = [phone for phone in phones if phone]
+    if not emails and not phones:
+        return None
+    return hashlib.sha1('|'.join(emails + ['#'] + phones).encode('utf-8')).hexdigest()[:20]
+
+def _lead_keys(result: Dict) -> List[str]:
+    keys = []
+    domain = normalize_domain(result.get('url', ''))
+    if domain:
+        keys.append(f"d:{domain}")
+    fingerprint = contact_fingerprint(result)
+    if fingerprint:
+        keys.append(f"f:{fingerprint}")
+    return keys
+
+def record_delivered(email: str, results: Iterable[Dict]) -> None:
+    """
+    Remember that these leads were delivered to the customer. Only rows with an email or
+    phone count: an error or an empty page must not hide that site from the customer later.
+    """
+    email = email.strip().lower()
+    now = time.time()
+    rows = [
+        (email, key, now)
+        for result in results
+        if 'error' not in result and (result.get('emails') or result.get('phones'))
+        for key in _lead_keys(result)
+    ]
+    if not rows:
+        return
+    with _lock:
+        _get_conn().executemany('INSERT OR IGNORE INTO deliveries (email, key, delivered_at) VALUES (?, ?, ?)', rows)
+
+def was_delivered(email: str, result: Dict) -> bool:
+    """Check whether the customer already received this lead, under its domain or its contacts"""
+    email = email.strip().lower()
+    keys = _lead_keys(result)
+    if not keys:
+        return False
+    # Asked of the shared database every time, so deliveries made by other worker processes count
+    with _lock:
+        placeholders = ','.join('?' * len(keys))
+        row = _get_conn().execute(
+            f'SELECT 1 FROM deliveries WHERE email = ? AND key IN ({placeholders}) LIMIT 1', [email] + keys
+        ).fetchone()
+    return row is not None
+
+class RunDeduper:
+    """
+    Deduplicates one search run: urls on a domain already seen in the run are skipped
+    before fetching, and results whose contacts match an earlier result are dropped.
+    With an email and DEDUP_DELIVERED_MODE set, leads the customer already received
+    are flagged ('mark') or dropped ('skip').
+    """
+
+    def __init__(self, email: str = None, delivered_mode: str = None):
+        self.email = email
+        self.delivered_mode = (delivered_mode or DEDUP_DELIVERED_MODE) if email else 'off'
+        self.domains = set()
+        self.fingerprints = set()
+
+    def unique_urls(self, urls: Iterable[str]) -> Iterator[str]:
+        """Yield urls in order, skipping every url on a domain already yielded"""
+        for url in urls:
+            domain = normalize_domain(url)
+            if domain in self.domains:
+                _stats['duplicate_domains'] += 1
+                continue
+            self.domains.add(domain)
+            yield url
+
+    def accept(self, result: Dict) -> bool:
+        """Decide whether a scraped result belongs in this run's results"""
+        fingerprint = contact_fingerprint(result)
+        if fingerprint in self.fingerprints:
+            _stats['duplicate_contacts'] += 1
+            return False
+        if fingerprint:
+            self.fingerprints.add(fingerprint)
+
+        if self.delivered_mode in ('mark', 'skip') and was_delivered(self.email, result):
+            _stats['delivered_hits'] += 1
+            if self.delivered_mode == 'skip':
+                return False
+            result['previously_delivered'] = True
+        return True
+
+def index_stats() -> Dict:
+    """Get dedup counters and index sizes"""
+    with _lock:
+        conn = _get_conn()
+        deliveries = conn.execute('SELECT COUNT(*) FROM deliveries').fetchone()[0]
+        stats = dict(_stats)
+    stats.update({
+        'delivered_mode': DEDUP_DELIVERED_MODE,
+        'deliveries_recorded': deliveries
+    })
+    return stats
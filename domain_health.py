@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+import requests
+from config import load_env
+
+load_env()
+
+# Circuit breaker and adaptive timeout settings
+DOMAIN_FAILURE_THRESHOLD = int(os.getenv('DOMAIN_FAILURE_THRESHOLD', '3'))  # consecutive failures before skipping
+DOMAIN_COOLDOWN = float(os.getenv('DOMAIN_COOLDOWN', '900'))  # seconds a failing domain is skipped
+DOMAIN_MIN_TIMEOUT = float(os.getenv('DOMAIN_MIN_TIMEOUT', '4'))
+DOMAIN_MAX_TIMEOUT = float(os.getenv('DOMAIN_MAX_TIMEOUT', '15'))
+DOMAIN_TIMEOUT_MULTIPLIER = float(os.getenv('DOMAIN_TIMEOUT_MULTIPLIER', '4'))  # timeout = typical latency x this
+DOMAIN_MAX_TRACKED = 20000
+LATENCY_SMOOTHING = 0.3  # weight of the newest sample in the latency average
+
+class _DomainHealth:
+    def __init__(self):
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.consecutive_failures = 0
+        self.latency = None  # exponentially weighted average, seconds
+        self.open_until = 0.0
+        self.probing = False
+        self.last_error = None
+        self.updated_at = time.time()
+
+_domains = {}
+_lock = threading.Lock()
+_stats = {'short_circuited': 0}
+
+def _domain_key(url: str) -> str:
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def _get(key: str) -> _DomainHealth:
+    health = _domains.get(key)
+    if health is None:
+        if len(_domains) >= DOMAIN_MAX_TRACKED:
+            # Forget the half of the domains seen least recently
+            stale = sorted(_domains, key=lambda host: _domains[host].updated_at)
+            for host in stale[:len(stale) // 2]:
+                del _domains[host]
+        health = _domains[key] = _DomainHealth()
+    return health
+
+def allow(url: str) -> bool:
+    """
+    Check whether the url's domain may be fetched.
+    Domains that failed DOMAIN_FAILURE_THRESHOLD times in a row are skipped for
+    DOMAIN_COOLDOWN seconds; after that a single probe request is let through.
+    """
+    key = _domain_key(url)
+    with _lock:
+        health = _domains.get(key)
+        if health is None or health.consecutive_failures < DOMAIN_FAILURE_THRESHOLD:
+            return True
+        if time.time() < health.open_until or health.probing:
+            _stats['short_circuited'] += 1
+            return False
+        health.probing = True
+        return True
+
+def release_probe(url: str) -> None:
+    """Let the next request probe the domain again when this one ended without a verdict"""
+    with _lock:
+        health = _domains.get(_domain_key(url))
+        if health is not None:
+            health.probing = False
+
+def timeout_for(url: str) -> float:
+    """Get a fetch timeout scaled to how fast the domain has answered before"""
+    with _lock:
+        health = _domains.get(_domain_key(url))
+        latency = health.latency if health else None
+    if latency is None:
+        return DOMAIN_MAX_TIMEOUT
+    return min(DOMAIN_MAX_TIMEOUT, max(DOMAIN_MIN_TIMEOUT, latency * DOMAIN_TIMEOUT_MULTIPLIER))
+
+def record_success(url: str, elapsed: float) -> None:
+    """Record a completed fetch and its latency, closing the domain's circuit"""
+    with _lock:
+        health = _get(_domain_key(url))
+        health.successes += 1
+        health.consecutive_failures = 0
+        health.probing = False
+        health.open_until = 0.0
+        if health.latency is None:
+            health.latency = elapsed
+        else:
+            health.latency = LATENCY_SMOOTHING * elapsed + (1 - LATENCY_SMOOTHING) * health.latency
+        health.updated_at = time.time()
+
+def record_failure(url: str, error: Exception) -> None:
+    """
+    Record a failed fetch. Only failures that say something about the whole domain count:
+    timeouts, connection errors and 5xx responses. A 404 on one page does not, and
+    503 is left to the politeness scheduler, which backs the domain off instead.
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        kind = 'timeout'
+    elif isinstance(error, requests.exceptions.ConnectionError):
+        kind = 'connection'
+    elif isinstance(error, requests.exceptions.HTTPError) and error.response is not None \
+            and error.response.status_code >= 500 and error.response.status_code != 503:
+        kind = 'server_error'
+    else:
+        # Says nothing about the domain, but a probe that ended this way is over
+        release_probe(url)
+        return
+
+    with _lock:
+        health = _get(_domain_key(url))
+        health.failures += 1
+        if kind == 'timeout':
+            health.timeouts += 1
+        health.consecutive_failures += 1
+        health.probing = False
+        health.last_error = f"{kind}: {str(error)[:200]}"
+        if health.consecutive_failures >= DOMAIN_FAILURE_THRESHOLD:
+            health.open_until = time.time() + DOMAIN_COOLDOWN
+        health.updated_at = time.time()
+
+def domain_stats(include_domains: bool = True) -> Dict:
+    """Get the health registry: counts of open circuits plus per-domain details"""
+    now = time.time()
+    with _lock:
+        domains = {}
+        open_circuits = 0
+        for host, health in _domains.items():
+            is_open = health.consecutive_failures >= DOMAIN_FAILURE_THRESHOLD and now < health.open_until
+            open_circuits += is_open
+            if include_domains:
+                domains[host] = {
+                    'successes': health.successes,
+                    'failures': health.failures,
+                    'timeouts': health.timeouts,
+                    'consecutive_failures': health.consecutive_failures,
+                    'latency': round(health.latency, 3) if health.latency is not None else None,
+                    'circuit_open': bool(is_open),
+                    'open_for': round(max(health.open_until - now, 0.0), 1) if is_open else 0.0,
+                    'last_error': health.last_error
+                }
+        stats = {
+            'domains_tracked': len(_domains),
+            'open_circuits': open_circuits,
+            'short_circuited': _stats['short_circuited']
+        }
+    if include_domains:
+        stats['domains'] = domains
+    return stats
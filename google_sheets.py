@@ -2,12 +2,29 @@
 import gspread
 from google.oauth2.service_account import Credentials
 import os
-from datetime import datetime
-from typing import List, Dict
-from dotenv import load_dotenv
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Tuple
+from contextlib import contextmanager
+from gspread.utils import a1_range_to_grid_range
+from config import load_env
 import time
+import metrics
 
-load_dotenv()
+load_env()
+
+SPREADSHEET_KEY = '1iSTfk87NFPfQXzRY8RyB7CQzqBOnU5-MFeTxLeFoXSQ'
+
+# Rows appended per Sheets call when results are written as they arrive
+SHEET_BATCH_SIZE = int(os.getenv('SHEET_BATCH_SIZE', '10'))
+
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN = int(os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN', '300'))  # seconds
+
+# Process-wide client and spreadsheet handle, shared by all request threads
+_client = None
+_spreadsheet = None
+_client_lock = threading.Lock()
 
 def setup_google_sheets():
     """Setup Google Sheets client"""
@@ -46,6 +63,54 @@ def make_spreadsheet_public(spreadsheet):
                 print(f"All sharing methods failed: {e3}")
                 return False
 
+def _refresh_token_if_needed(client) -> None:
+    """Refresh the service account token before it expires rather than on a failed call"""
+    creds = client.auth
+    expiry = getattr(creds, 'expiry', None)
+    if creds.token is None or expiry is None or expiry - datetime.utcnow() < timedelta(seconds=TOKEN_REFRESH_MARGIN):
+        client.login()
+
+def get_client():
+    """Get the shared Google Sheets client, authorizing it on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = setup_google_sheets()
+        _refresh_token_if_needed(_client)
+        return _client
+
+def open_spreadsheet(client):
+    """Open the results spreadsheet, creating and sharing it if it doesn't exist"""
+    try:
+        return client.open_by_key(SPREADSHEET_KEY)
+    except gspread.SpreadsheetNotFound:
+        sheet_name = os.getenv('GOOGLE_SHEET_NAME', 'Web Scraper Results')
+        spreadsheet = client.create(sheet_name)
+        # Make spreadsheet publicly accessible
+        success = make_spreadsheet_public(spreadsheet)
+        if not success:
+            print("⚠️  Manual sharing required:")
+            print(f"   1. Open: {spreadsheet.url}")
+            print(f"   2. Click 'Share' → 'Anyone with the link can view'")
+            print(f"   3. Copy the shareable link")
+        return spreadsheet
+
+def get_spreadsheet():
+    """Get the shared spreadsheet handle, opening it on first use"""
+    global _spreadsheet
+    client = get_client()
+    with _client_lock:
+        if _spreadsheet is None:
+            _spreadsheet = open_spreadsheet(client)
+        return _spreadsheet
+
+def reset_google_sheets() -> None:
+    """Drop the cached client and spreadsheet so the next call re-authorizes and reopens"""
+    global _client, _spreadsheet
+    with _client_lock:
+        _client = None
+        _spreadsheet = None
+
 def extract_title_from_url(url: str) -> str:
     """Extract a simple title from URL"""
     try:
@@ -55,141 +120,279 @@ def extract_title_from_url(url: str) -> str:
     except:
         return "Unknown"
 
-def save_to_sheet(scraped_data: List[Dict], niche: str, location: str) -> str:
-    """Save scraped data to Google Sheet and return sheet URL"""
+# Sheet headers - matching old format
+SHEET_HEADERS = [
+    'URL',
+    'Title', 
+    'Emails',
+    'Phone Numbers',
+    'Facebook Profiles',
+    'Instagram Profiles', 
+    'Scraped At',
+    'Status'
+]
+
+def split_social_links(social_links) -> Tuple[List[str], List[str]]:
+    """Get (facebook, instagram) profile lists from either social_links shape"""
+    if isinstance(social_links, dict):
+        return social_links.get('facebook', []), social_links.get('instagram', [])
+    if isinstance(social_links, list):
+        # Filter by platform if it's a simple list
+        return (
+            [link for link in social_links if 'facebook.com' in link],
+            [link for link in social_links if 'instagram.com' in link]
+        )
+    return [], []
+
+def build_row(item: Dict, scraped_time: str) -> List:
+    """Build the sheet row for one scraped item"""
+    facebook_profiles, instagram_profiles = split_social_links(item.get('social_links', {}))
+    
+    # Generate title from URL
+    title = extract_title_from_url(item['url'])
+    
+    # Determine status
+    if 'error' in item:
+        status = 'Error'
+    elif item.get('previously_delivered'):
+        status = 'Previously Delivered'
+    else:
+        status = 'Success'
+    
+    return [
+        item['url'],
+        title,
+        ', '.join(item.get('emails', [])) if item.get('emails') else '',
+        ', '.join(item.get('phones', [])) if item.get('phones') else '',
+        ', '.join(facebook_profiles) if facebook_profiles else '',
+        ', '.join(instagram_profiles) if instagram_profiles else '',
+        scraped_time,
+        status
+    ]
+
+def build_summary_rows(scraped_data: List[Dict], niche: str, location: str) -> List[List]:
+    """Build the summary block, starting with its blank separator row"""
+    total_emails = sum(len(item.get('emails', [])) for item in scraped_data)
+    total_phones = sum(len(item.get('phones', [])) for item in scraped_data)
+    
+    total_facebook = 0
+    total_instagram = 0
+    for item in scraped_data:
+        social_links = item.get('social_links', {})
+        if isinstance(social_links, dict):
+            total_facebook += len(social_links.get('facebook', []))
+            total_instagram += len(social_links.get('instagram', []))
+    
+    return [
+        [],  # Empty row
+        ['Summary'],
+        ['Search Query', f'"{niche}" "{location}"'],
+        ['Total URLs Scraped', len(scraped_data)],
+        ['Total Emails Found', total_emails],
+        ['Total Phone Numbers Found', total_phones],
+        ['Total Facebook Profiles Found', total_facebook],
+        ['Total Instagram Profiles Found', total_instagram]
+    ]
+
+def build_sheet_grid(scraped_data: List[Dict], niche: str, location: str) -> List[List]:
+    """Build every row of a results worksheet: header, one row per item, then the summary"""
+    scraped_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    grid = [SHEET_HEADERS]
+    grid.extend(build_row(item, scraped_time) for item in scraped_data)
+    grid.extend(build_summary_rows(scraped_data, niche, location))
+    return grid
+
+def build_format_requests(sheet_id: int, data_row_count: int) -> List[Dict]:
+    """Build batch_update requests for header colour, summary styling and column resize"""
+    summary_start_row = data_row_count + 3
+    return [
+        # Format headers with blue background
+        {
+            'repeatCell': {
+                'range': a1_range_to_grid_range('A1:H1', sheet_id),
+                'cell': {'userEnteredFormat': {
+                    'textFormat': {'bold': True},
+                    'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 0.9}
+                }},
+                'fields': 'userEnteredFormat(textFormat,backgroundColor)'
+            }
+        },
+        # Format summary section
+        {
+            'repeatCell': {
+                'range': a1_range_to_grid_range(f'A{summary_start_row}:B{summary_start_row}', sheet_id),
+                'cell': {'userEnteredFormat': {
+                    'textFormat': {'bold': True},
+                    'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
+                }},
+                'fields': 'userEnteredFormat(textFormat,backgroundColor)'
+            }
+        },
+        # Auto-resize columns
+        {
+            'autoResizeDimensions': {
+                'dimensions': {
+                    'sheetId': sheet_id,
+                    'dimension': 'COLUMNS',
+                    'startIndex': 0,
+                    'endIndex': 7
+                }
+            }
+        }
+    ]
+
+@contextmanager
+def _sheets_call(call: str):
+    """Time a Sheets API call and count it by outcome"""
+    outcome = 'error'
     try:
-        client = setup_google_sheets()
-        
-        # Get or create spreadsheet
-        sheet_name = os.getenv('GOOGLE_SHEET_NAME', 'Web Scraper Results')
-        
-        try:
-            spreadsheet = client.open_by_key('1iSTfk87NFPfQXzRY8RyB7CQzqBOnU5-MFeTxLeFoXSQ')
-        except gspread.SpreadsheetNotFound:
-            spreadsheet = client.create(sheet_name)
-            # Make spreadsheet publicly accessible
-            success = make_spreadsheet_public(spreadsheet)
-            if not success:
-                print("⚠️  Manual sharing required:")
-                print(f"   1. Open: {spreadsheet.url}")
-                print(f"   2. Click 'Share' → 'Anyone with the link can view'")
-                print(f"   3. Copy the shareable link")
+        with metrics.timed(f'sheets_{call}'):
+            yield
+        outcome = 'ok'
+    finally:
+        metrics.API_CALLS.inc(api='sheets', call=call, outcome=outcome)
+
+def _handle_sheets_error(e: Exception) -> None:
+    print(f"Error saving to Google Sheets: {str(e)}")
+    if isinstance(e, (gspread.exceptions.APIError, gspread.SpreadsheetNotFound)):
+        # The cached handle may point at a deleted spreadsheet or revoked token
+        reset_google_sheets()
+
+class SheetWriter:
+    """
+    Writes one search's results worksheet incrementally.
+    Rows are buffered and appended every batch_size items; finish() appends the summary
+    block and applies formatting. The worksheet is only created once there is a row to write.
+    """
+
+    def __init__(self, niche: str, location: str, batch_size: int = None, expected_rows: int = 30):
+        self.niche = niche
+        self.location = location
+        self.batch_size = batch_size or SHEET_BATCH_SIZE
+        self.expected_rows = expected_rows
+        self.items = []
+        self.spreadsheet = None
+        self.worksheet = None
+        self._buffer = [SHEET_HEADERS]
+
+    def _open(self) -> None:
+        self.spreadsheet = get_spreadsheet()
         
         # Create new worksheet for this search
         timestamp = time.strftime('%Y%m%d_%H%M%S')
-        worksheet_name = f"{niche}_{location}_{timestamp}"
+        worksheet_name = f"{self.niche}_{self.location}_{timestamp}"
         
         try:
-            worksheet = spreadsheet.add_worksheet(
-                title=worksheet_name,
-                rows=len(scraped_data) + 20,
-                cols=10
-            )
+            with _sheets_call('add_worksheet'):
+                self.worksheet = self.spreadsheet.add_worksheet(
+                    title=worksheet_name,
+                    rows=self.expected_rows + 20,
+                    cols=10
+                )
         except Exception:
             # If worksheet creation fails, use the first sheet
-            worksheet = spreadsheet.sheet1
-            worksheet.clear()
-        
-        # Prepare headers - matching old format
-        headers = [
-            'URL',
-            'Title', 
-            'Emails',
-            'Phone Numbers',
-            'Facebook Profiles',
-            'Instagram Profiles', 
-            'Scraped At',
-            'Status'
-        ]
-        
-        # Add headers
-        worksheet.append_row(headers)
-        
-        # Add data rows
-        scraped_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        for item in scraped_data:
-            # Extract social links properly
-            social_links = item.get('social_links', {})
-            facebook_profiles = []
-            instagram_profiles = []
-            
-            if isinstance(social_links, dict):
-                facebook_profiles = social_links.get('facebook', [])
-                instagram_profiles = social_links.get('instagram', [])
-            elif isinstance(social_links, list):
-                # Filter by platform if it's a simple list
-                facebook_profiles = [link for link in social_links if 'facebook.com' in link]
-                instagram_profiles = [link for link in social_links if 'instagram.com' in link]
-            
-            # Generate title from URL
-            title = extract_title_from_url(item['url'])
-            
-            # Determine status
-            status = 'Error' if 'error' in item else 'Success'
-            
-            row = [
-                item['url'],
-                title,
-                ', '.join(item.get('emails', [])) if item.get('emails') else '',
-                ', '.join(item.get('phones', [])) if item.get('phones') else '',
-                ', '.join(facebook_profiles) if facebook_profiles else '',
-                ', '.join(instagram_profiles) if instagram_profiles else '',
-                scraped_time,
-                status
-            ]
-            worksheet.append_row(row)
-        
-        # Add summary section - matching old format
-        worksheet.append_row([])  # Empty row
-        worksheet.append_row(['Summary'])
-        worksheet.append_row(['Search Query', f'"{niche}" "{location}"'])
-        worksheet.append_row(['Total URLs Scraped', len(scraped_data)])
-        
-        # Calculate totals
-        total_emails = sum(len(item.get('emails', [])) for item in scraped_data)
-        total_phones = sum(len(item.get('phones', [])) for item in scraped_data)
-        
-        total_facebook = 0
-        total_instagram = 0
-        for item in scraped_data:
-            social_links = item.get('social_links', {})
-            if isinstance(social_links, dict):
-                total_facebook += len(social_links.get('facebook', []))
-                total_instagram += len(social_links.get('instagram', []))
-        
-        worksheet.append_row(['Total Emails Found', total_emails])
-        worksheet.append_row(['Total Phone Numbers Found', total_phones])
-        worksheet.append_row(['Total Facebook Profiles Found', total_facebook])
-        worksheet.append_row(['Total Instagram Profiles Found', total_instagram])
+            self.worksheet = self.spreadsheet.sheet1
+            self.worksheet.clear()
+
+    def add(self, item: Dict) -> None:
+        """Queue a scraped item, appending a batch to the sheet once batch_size are waiting"""
+        self.items.append(item)
+        self._buffer.append(build_row(item, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Append buffered rows to the worksheet"""
+        if not self._buffer:
+            return
+        try:
+            if self.worksheet is None:
+                self._open()
+            with _sheets_call('append_rows'):
+                self.worksheet.append_rows(self._buffer, value_input_option='RAW', table_range='A1')
+        except Exception as e:
+            _handle_sheets_error(e)
+            raise
+        self._buffer = []
+
+    def finish(self) -> str:
+        """Append remaining rows and the summary block, format the sheet and return its URL"""
+        self._buffer.extend(build_summary_rows(self.items, self.niche, self.location))
+        self.flush()
         
-        # Format the worksheet - matching old format
+        # Format the worksheet in a single batch request - matching old format
         try:
-            # Format headers with blue background
-            worksheet.format('A1:H1', {
-                'textFormat': {'bold': True},
-                'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 0.9}
-            })
-            
-            # Format summary section
-            summary_start_row = len(scraped_data) + 3
-            worksheet.format(f'A{summary_start_row}:B{summary_start_row}', {
-                'textFormat': {'bold': True},
-                'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9}
-            })
-            
-            # Auto-resize columns
-            try:
-                worksheet.columns_auto_resize(0, 7)
-            except:
-                # Fallback: set specific column widths
-                pass
-                
+            with _sheets_call('format'):
+                self.spreadsheet.batch_update({
+                    'requests': build_format_requests(self.worksheet.id, len(self.items))
+                })
         except Exception as e:
             print(f"Column formatting warning: {e}")
         
-        return spreadsheet.url
-        
+        return self.spreadsheet.url
+
+def save_to_sheet(scraped_data: List[Dict], niche: str, location: str) -> str:
+    """Save scraped data to Google Sheet and return sheet URL"""
+    # With every row buffered up front, header, rows and summary go out in one append call
+    writer = SheetWriter(niche, location, batch_size=len(scraped_data) + 2, expected_rows=len(scraped_data))
+    for item in scraped_data:
+        writer.add(item)
+    return writer.finish()
+
+def _a1_sheet_range(title: str) -> str:
+    return "'{}'!A1".format(title.replace("'", "''"))
+
+def save_bulk_to_sheets(batches: List[Tuple[str, str, List[Dict]]]) -> List[str]:
+    """
+    Save several searches' results, one worksheet each, in three Sheets calls in total:
+    one to add every worksheet, one to write every grid and one to format them all.
+    batches is a list of (niche, location, scraped_data). Returns each worksheet's URL.
+    """
+    if not batches:
+        return []
+    try:
+        spreadsheet = get_spreadsheet()
+        timestamp = time.strftime('%Y%m%d_%H%M%S')
+
+        titles = []
+        for niche, location, _ in batches:
+            # Sheet titles are capped at 100 characters and must be unique in the spreadsheet
+            title = f"{niche}_{location}_{timestamp}"[:90]
+            if title in titles:
+                title = f"{title}_{len(titles) + 1}"
+            titles.append(title)
+        grids = [build_sheet_grid(data, niche, location) for niche, location, data in batches]
+
+        with _sheets_call('add_worksheet'):
+            response = spreadsheet.batch_update({'requests': [
+                {'addSheet': {'properties': {
+                    'title': title,
+                    'gridProperties': {'rowCount': len(grid) + 20, 'columnCount': 10}
+                }}}
+                for title, grid in zip(titles, grids)
+            ]})
+        sheet_ids = [reply['addSheet']['properties']['sheetId'] for reply in response['replies']]
+
+        with _sheets_call('append_rows'):
+            spreadsheet.values_batch_update({
+                'valueInputOption': 'RAW',
+                'data': [
+                    {'range': _a1_sheet_range(title), 'values': grid}
+                    for title, grid in zip(titles, grids)
+                ]
+            })
     except Exception as e:
-        print(f"Error saving to Google Sheets: {str(e)}")
+        _handle_sheets_error(e)
         raise
+
+    try:
+        with _sheets_call('format'):
+            spreadsheet.batch_update({'requests': [
+                request
+                for sheet_id, (_, _, data) in zip(sheet_ids, batches)
+                for request in build_format_requests(sheet_id, len(data))
+            ]})
+    except Exception as e:
+        print(f"Column formatting warning: {e}")
+
+    return [f"{spreadsheet.url}#gid={sheet_id}" for sheet_id in sheet_ids]
@@ -0,0 +1,40 @@
+import os
+
+# Gunicorn settings for production; every value can be overridden from the environment
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+# Scrapes spend most of their time waiting on the network, so each worker process
+# serves several requests on threads
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+
+# Workers that stop responding for this long are restarted. Long scrapes are bounded by
+# SCRAPE_REQUEST_TIMEOUT in the app instead.
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+# On shutdown or redeploy, in-flight requests and queued jobs get this long to finish
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '90'))
+JOBS_DRAIN_TIMEOUT = float(os.getenv('JOBS_DRAIN_TIMEOUT', str(max(graceful_timeout - 30, 5))))
+
+keepalive = 5
+accesslog = '-'
+errorlog = '-'
+
+# Quota counters buffered in one process aren't seen by the others, so with several
+# workers every check and charge must go through the shared database
+quota_consistency = os.getenv('QUOTA_CONSISTENCY', 'strict')
+if workers > 1 and quota_consistency.lower() != 'strict':
+    print(f"QUOTA_CONSISTENCY={quota_consistency} is unsafe with {workers} workers; using strict")
+    os.environ['QUOTA_CONSISTENCY'] = 'strict'
+
+def post_worker_init(worker):
+    """Warm up in the background once the worker is ready; the listening socket is already bound"""
+    from warmup import WARMUP_ENABLED, start_warmup
+    if WARMUP_ENABLED:
+        start_warmup()
+
+def worker_exit(server, worker):
+    """Finish or refund background scrape jobs and flush quota before the worker exits"""
+    from app import drain_background_work
+    drain_background_work(JOBS_DRAIN_TIMEOUT)
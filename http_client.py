@@ -0,0 +1,114 @@
+import os
+import threading
+from typing import Dict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import load_env
+
+load_env()
+
+# Connection pool and retry settings
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '100'))  # hosts kept in the pool manager
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))  # connections kept per host
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '1'))  # retries on connection errors and 5xx answers
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+_adapter = None
+_adapter_lock = threading.Lock()
+_local = threading.local()
+
+def _build_adapter() -> HTTPAdapter:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        # A read timeout means the host is up but stalled; retrying it would multiply the fetch
+        # timeout and run past the adaptive per-domain timeouts and the request deadline.
+        # False re-raises the timeout itself, so domain health still counts it as one
+        read=False,
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        # 429/503 are left to the politeness scheduler, which backs off the whole domain
+        # instead of sleeping inside a fetch worker
+        status_forcelist=(500, 502, 504),
+        respect_retry_after_header=False,
+        # Serper searches are POSTs but safe to repeat
+        allowed_methods=frozenset(['GET', 'HEAD', 'POST']),
+        raise_on_status=False
+    )
+    return HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry
+    )
+
+def _get_adapter() -> HTTPAdapter:
+    global _adapter
+    if _adapter is None:
+        with _adapter_lock:
+            if _adapter is None:
+                _adapter = _build_adapter()
+    return _adapter
+
+def get_session() -> requests.Session:
+    """
+    Get the calling thread's HTTP session.
+    Every session shares one connection pool, so connections are reused across threads
+    while cookies and other session state stay per thread.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        adapter = _get_adapter()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _local.session = session
+    return session
+
+def pool_stats() -> Dict:
+    """Get connection reuse statistics for the shared pool"""
+    adapter = _adapter
+    hosts = {}
+    total_requests = 0
+    total_connections = 0
+    total_idle = 0
+
+    if adapter is not None:
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+
+            idle = sum(
+                1 for conn in list(pool.pool.queue)
+                if conn is not None and getattr(conn, 'sock', None) is not None
+            ) if pool.pool is not None else 0
+
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            hosts[host] = {
+                'requests': pool.num_requests,
+                'new_connections': pool.num_connections,
+                'idle_connections': idle
+            }
+            total_requests += pool.num_requests
+            total_connections += pool.num_connections
+            total_idle += idle
+
+    reused = max(0, total_requests - total_connections)
+    return {
+        'pool_maxsize': HTTP_POOL_MAXSIZE,
+        'requests': total_requests,
+        'new_connections': total_connections,
+        'reused_requests': reused,
+        'reuse_ratio': round(reused / total_requests, 3) if total_requests else 0.0,
+        'idle_connections': total_idle,
+        'hosts': hosts
+    }
@@ -0,0 +1,235 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+from config import load_env
+from db import connect_db
+
+load_env()
+
+# Background job settings for /scrape
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', 'jobs.db')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_QUEUE_MAX = int(os.getenv('JOB_QUEUE_MAX', '20'))  # queued jobs before new ones are rejected
+
+class JobQueueFull(Exception):
+    """Raised when the job queue is at capacity"""
+
+_queue = queue.Queue(maxsize=max(1, JOB_QUEUE_MAX))
+_workers = []
+_workers_lock = threading.Lock()
+_db_lock = threading.Lock()
+_conn = None
+_running = {}  # job_id -> (kwargs, cancel event) of jobs a worker is executing
+_accepting = True
+
+def _get_conn() -> sqlite3.Connection:
+    # Job state lives in SQLite so any worker process can answer a status poll
+    global _conn
+    if _conn is None:
+        _conn = connect_db(JOBS_DB_PATH)
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                niche TEXT,
+                location TEXT,
+                email TEXT,
+                progress_done INTEGER NOT NULL DEFAULT 0,
+                progress_target INTEGER NOT NULL DEFAULT 0,
+                sheet_url TEXT,
+                results_count INTEGER,
+                error TEXT,
+                result TEXT,
+                refunded INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        ''')
+        # Job databases created before the result and refunded columns existed
+        columns = [row[1] for row in _conn.execute('PRAGMA table_info(jobs)')]
+        if 'result' not in columns:
+            _conn.execute('ALTER TABLE jobs ADD COLUMN result TEXT')
+        if 'refunded' not in columns:
+            _conn.execute('ALTER TABLE jobs ADD COLUMN refunded INTEGER NOT NULL DEFAULT 0')
+    return _conn
+
+def _update(job_id: str, **fields) -> None:
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    with _db_lock:
+        _get_conn().execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+def _finish(job_id: str, refund: bool = False, **fields) -> bool:
+    """
+    Record a job's final status unless it already has one; returns False if it had.
+    With refund, the job's refund is claimed in the same statement and the update only
+    happens if nobody claimed it first.
+    """
+    fields['finished_at'] = time.time()
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    where = 'id = ? AND finished_at IS NULL'
+    if refund:
+        columns += ', refunded = 1'
+        where += ' AND refunded = 0'
+    with _db_lock:
+        cursor = _get_conn().execute(f"UPDATE jobs SET {columns} WHERE {where}", (*fields.values(), job_id))
+    return cursor.rowcount == 1
+
+def claim_refund(job_id: str) -> bool:
+    """
+    Claim the right to refund a job's quota; True for the first caller only. A job cut off
+    at shutdown is refunded by the server, so the job itself must not refund it again.
+    """
+    with _db_lock:
+        cursor = _get_conn().execute('UPDATE jobs SET refunded = 1 WHERE id = ? AND refunded = 0', (job_id,))
+    return cursor.rowcount == 1
+
+def _worker() -> None:
+    while True:
+        item = _queue.get()
+        if item is None:
+            _queue.task_done()
+            return
+
+        job_id, func, kwargs = item
+        cancel = threading.Event()
+        with _workers_lock:
+            _running[job_id] = (kwargs, cancel)
+        _update(job_id, status='running', started_at=time.time())
+
+        def progress(done: int, target: int, job_id=job_id) -> None:
+            _update(job_id, progress_done=done, progress_target=target)
+
+        try:
+            result = func(progress=progress, job_id=job_id, cancel=cancel, **kwargs)
+            # The whole result is kept too, e.g. the per-search entries of a bulk job
+            payload = json.dumps(result, default=str)
+            if result.get('error'):
+                _finish(job_id, status='failed', error=result['error'], results_count=result.get('results_count', 0),
+                        result=payload)
+            else:
+                _finish(job_id, status='done', sheet_url=result.get('sheet_url'),
+                        results_count=result.get('results_count', 0), result=payload)
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            _finish(job_id, status='failed', error=str(e))
+        finally:
+            with _workers_lock:
+                _running.pop(job_id, None)
+            _queue.task_done()
+
+def _ensure_workers() -> None:
+    with _workers_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+        while len(_workers) < max(1, JOB_WORKERS):
+            worker = threading.Thread(target=_worker, name=f'scrape-job-{len(_workers)}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+def submit_job(func: Callable[..., Dict], niche: str, location: str, email: str = None, **options) -> str:
+    """
+    Queue func(niche=..., location=..., email=..., progress=..., job_id=..., cancel=..., **options)
+    to run in the background. cancel is a threading.Event set when the server gives up on the
+    job at shutdown; func should stop soon after, and refund quota only if claim_refund(job_id)
+    says it may. func returns a dict with 'sheet_url' and 'results_count', or 'error'; get_job
+    returns the whole dict as 'result' once the job has finished.
+    Raises JobQueueFull when JOB_QUEUE_MAX jobs are already waiting or the server is shutting down.
+    """
+    if not _accepting:
+        raise JobQueueFull("Server is shutting down")
+    job_id = uuid.uuid4().hex
+    with _db_lock:
+        _get_conn().execute(
+            'INSERT INTO jobs (id, status, niche, location, email, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, 'queued', niche, location, email, time.time())
+        )
+
+    _ensure_workers()
+    try:
+        _queue.put_nowait((job_id, func, dict(options, niche=niche, location=location, email=email)))
+    except queue.Full:
+        _finish(job_id, status='rejected', error='Job queue is full')
+        raise JobQueueFull(f"Job queue is full ({JOB_QUEUE_MAX} jobs waiting)")
+    return job_id
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Get a job's status, progress and result, including the full dict its function returned"""
+    with _db_lock:
+        conn = _get_conn()
+        cursor = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        columns = [column[0] for column in cursor.description]
+    if row is None:
+        return None
+
+    job = dict(zip(columns, row))
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'niche': job['niche'],
+        'location': job['location'],
+        'progress': {'done': job['progress_done'], 'target': job['progress_target']},
+        'sheet_url': job['sheet_url'],
+        'results_count': job['results_count'],
+        'error': job['error'],
+        'result': json.loads(job['result']) if job['result'] else None,
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at']
+    }
+
+def job_stats() -> Dict:
+    """Get the number of jobs waiting for a worker and running in this process"""
+    with _workers_lock:
+        running = len(_running)
+    return {
+        'queued': _queue.qsize(),
+        'queue_max': JOB_QUEUE_MAX,
+        'running': running,
+        'workers': JOB_WORKERS,
+        'accepting': _accepting
+    }
+
+def shutdown(timeout: float = 30) -> List[Dict]:
+    """
+    Stop taking jobs, cancel the ones still queued and wait up to timeout for running ones;
+    jobs still running at the deadline are told to stop through their cancel event.
+    Returns the kwargs (niche, location, email) of every job that was cancelled or cut off and
+    whose refund this call claimed, so the caller can refund their quota exactly once.
+    """
+    global _accepting
+    _accepting = False
+
+    abandoned = []
+    while True:
+        try:
+            item = _queue.get_nowait()
+        except queue.Empty:
+            break
+        _queue.task_done()
+        if item is None:
+            continue
+        job_id, _, kwargs = item
+        if _finish(job_id, refund=True, status='cancelled', error='Server shut down before the job started'):
+            abandoned.append(dict(kwargs, job_id=job_id))
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with _workers_lock:
+            if not _running:
+                break
+        time.sleep(0.2)
+
+    with _workers_lock:
+        interrupted = dict(_running)
+    for job_id, (kwargs, cancel) in interrupted.items():
+        cancel.set()
+        # A job that finished or refunded itself in the meantime keeps its own outcome
+        if _finish(job_id, refund=True, status='failed', error='Interrupted by server shutdown'):
+            abandoned.append(dict(kwargs, job_id=job_id))
+    return abandoned
@@ -0,0 +1,265 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional
+from config import load_env
+from db import connect_db
+from url_utils import normalize_domain
+
+load_env()
+
+# Local copy of every search's results, written before anything goes to Google Sheets
+LEAD_STORE_PATH = os.getenv('LEAD_STORE_PATH', 'leads.db')
+LEAD_STORE_PAGE_SIZE = 500  # rows read per query while streaming an export
+EXPORT_FORMATS = ('csv', 'ndjson', 'parquet')
+EXPORT_COLUMNS = ['url', 'domain', 'emails', 'phones', 'facebook', 'instagram', 'status', 'error',
+                  'niche', 'location', 'search_id', 'scraped_at']
+
+class ExportUnavailable(Exception):
+    """Raised when an export format needs an optional package that isn't installed"""
+
+_conn = None
+_lock = threading.Lock()
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = connect_db(LEAD_STORE_PATH)
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS searches (
+                id TEXT PRIMARY KEY,
+                niche TEXT NOT NULL COLLATE NOCASE,
+                location TEXT NOT NULL COLLATE NOCASE,
+                email TEXT,
+                status TEXT NOT NULL,
+                results_count INTEGER NOT NULL DEFAULT 0,
+                sheet_status TEXT,
+                sheet_url TEXT,
+                sheet_job_id TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            )
+        ''')
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                search_id TEXT NOT NULL,
+                niche TEXT NOT NULL COLLATE NOCASE,
+                location TEXT NOT NULL COLLATE NOCASE,
+                domain TEXT NOT NULL,
+                scraped_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+        ''')
+        # Stores created before sheet exports were queued as jobs
+        columns = [row[1] for row in _conn.execute('PRAGMA table_info(searches)')]
+        if 'sheet_job_id' not in columns:
+            _conn.execute('ALTER TABLE searches ADD COLUMN sheet_job_id TEXT')
+        _conn.execute('CREATE INDEX IF NOT EXISTS idx_results_search ON results (search_id, id)')
+    return _conn
+
+def new_search_id() -> str:
+    return uuid.uuid4().hex
+
+def create_search(niche: str, location: str, email: str = None, search_id: str = None,
+                  status: str = 'running') -> str:
+    """Record a new search and return its id"""
+    search_id = search_id or new_search_id()
+    with _lock:
+        _get_conn().execute(
+            'INSERT OR IGNORE INTO searches (id, niche, location, email, status, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (search_id, niche, location, email, status, time.time())
+        )
+    return search_id
+
+def update_search(search_id: str, **fields) -> None:
+    """Set status, results_count, sheet_status, sheet_url, sheet_job_id, error or finished_at on a search"""
+    columns = ', '.join(f"{name} = ?" for name in fields)
+    with _lock:
+        _get_conn().execute(f"UPDATE searches SET {columns} WHERE id = ?", (*fields.values(), search_id))
+
+def add_results(search_id: str, niche: str, location: str, items: Iterable[Dict]) -> None:
+    """Append scraped items to a search's results, in order"""
+    now = time.time()
+    rows = [
+        (search_id, niche, location, normalize_domain(item.get('url', '')), now, json.dumps(item))
+        for item in items
+    ]
+    if not rows:
+        return
+    with _lock:
+        conn = _get_conn()
+        conn.executemany(
+            'INSERT INTO results (search_id, niche, location, domain, scraped_at, data) VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        conn.execute('UPDATE searches SET results_count = results_count + ? WHERE id = ?', (len(rows), search_id))
+
+def get_search(search_id: str) -> Optional[Dict]:
+    """Get a search's niche, location, status, counts and sheet details"""
+    with _lock:
+        cursor = _get_conn().execute(
+            'SELECT id, niche, location, status, results_count, sheet_status, sheet_url, sheet_job_id, error, '
+            'created_at, finished_at '
+            'FROM searches WHERE id = ?', (search_id,)
+        )
+        row = cursor.fetchone()
+        columns = [column[0] for column in cursor.description]
+    if row is None:
+        return None
+    search = dict(zip(columns, row))
+    search['search_id'] = search.pop('id')
+    return search
+
+def _iter_pages(where: str, params: list, limit: int = None) -> Iterator[Dict]:
+    """
+    Yield stored results matching where, oldest first, reading LEAD_STORE_PAGE_SIZE rows per
+    query. Each page resumes after the last id seen, so no query or lock is held between pages.
+    """
+    last_id = 0
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_size = LEAD_STORE_PAGE_SIZE if remaining is None else min(LEAD_STORE_PAGE_SIZE, remaining)
+        with _lock:
+            rows = _get_conn().execute(
+                f'SELECT id, search_id, niche, location, domain, scraped_at, data FROM results '
+                f'WHERE {where} AND id > ? ORDER BY id LIMIT ?',
+                (*params, last_id, page_size)
+            ).fetchall()
+        for row_id, search_id, niche, location, domain, scraped_at, data in rows:
+            item = json.loads(data)
+            item.update({'search_id': search_id, 'niche': niche, 'location': location,
+                         'domain': domain, 'scraped_at': scraped_at})
+            yield item
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1][0]
+        if remaining is not None:
+            remaining -= len(rows)
+
+def iter_results(search_id: str) -> Iterator[Dict]:
+    """Yield a search's stored results in the order they were scraped"""
+    return _iter_pages('search_id = ?', [search_id])
+
+def _export_row(item: Dict) -> Dict:
+    """Flatten a stored result into EXPORT_COLUMNS, joining lists as the sheet does"""
+    social_links = item.get('social_links') or {}
+    if not isinstance(social_links, dict):
+        social_links = {
+            'facebook': [link for link in social_links if 'facebook.com' in link],
+            'instagram': [link for link in social_links if 'instagram.com' in link]
+        }
+    if 'error' in item:
+        status = 'Error'
+    elif item.get('previously_delivered'):
+        status = 'Previously Delivered'
+    else:
+        status = 'Success'
+    return {
+        'url': item.get('url', ''),
+        'domain': item.get('domain', ''),
+        'emails': ', '.join(item.get('emails', [])),
+        'phones': ', '.join(item.get('phones', [])),
+        'facebook': ', '.join(social_links.get('facebook', [])),
+        'instagram': ', '.join(social_links.get('instagram', [])),
+        'status': status,
+        'error': item.get('error', ''),
+        'niche': item.get('niche', ''),
+        'location': item.get('location', ''),
+        'search_id': item.get('search_id', ''),
+        'scraped_at': datetime.fromtimestamp(item['scraped_at'], timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def iter_csv(items: Iterable[Dict]) -> Iterator[str]:
+    """Yield a CSV export chunk by chunk: the header, then one page of rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, item in enumerate(items, 1):
+        writer.writerow(_export_row(item))
+        if count % LEAD_STORE_PAGE_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_ndjson(items: Iterable[Dict]) -> Iterator[str]:
+    """Yield one JSON line per result, keeping emails, phones and social links as lists"""
+    for item in items:
+        yield json.dumps(item) + '\n'
+
+class _DrainBuffer(io.RawIOBase):
+    """Write-only sink whose contents are taken out as they are written, so a file streams"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def iter_parquet(items: Iterable[Dict]) -> Iterator[bytes]:
+    """
+    Yield a Parquet export, one row group per LEAD_STORE_PAGE_SIZE results.
+    Needs pyarrow, which is optional; raises ExportUnavailable without it.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    return _iter_parquet_chunks(items, pa, pq, schema)
+
+def _iter_parquet_chunks(items: Iterable[Dict], pa, pq, schema) -> Iterator[bytes]:
+    sink = _DrainBuffer()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    rows = []
+    for item in items:
+        rows.append(_export_row(item))
+        if len(rows) >= LEAD_STORE_PAGE_SIZE:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            rows = []
+            yield sink.drain()
+    if rows:
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    writer.close()
+    yield sink.drain()
+
+def iter_export(items: Iterable[Dict], fmt: str) -> Iterator:
+    """Stream items as csv, ndjson or parquet; raises ExportUnavailable for parquet without pyarrow"""
+    if fmt == 'parquet':
+        return iter_parquet(items)
+    if fmt == 'ndjson':
+        return iter_ndjson(items)
+    return iter_csv(items)
+
+def store_stats() -> Dict:
+    """Get the number of stored searches and results"""
+    with _lock:
+        conn = _get_conn()
+        searches = conn.execute('SELECT COUNT(*) FROM searches').fetchone()[0]
+        results = conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+    return {'searches': searches, 'results': results}
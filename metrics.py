@@ -0,0 +1,194 @@
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import load_env
+
+load_env()
+
+# In-process metrics, exposed in the Prometheus text format on /metrics
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_PREFIX = 'leadscraper_'
+TRACE_MAX_SPANS = 500  # spans kept per trace; stage totals keep counting past it
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 524288, 1048576, 2097152, 4194304)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = SECONDS_BUCKETS):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(float(series[-2]))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Metrics shared across modules
+STAGE_SECONDS = Histogram('stage_seconds', 'Time spent in each pipeline stage', ('stage',))
+PAGE_BYTES = Histogram('page_bytes', 'Bytes downloaded per scraped page', buckets=BYTES_BUCKETS)
+API_CALLS = Counter('api_calls_total', 'Calls to external APIs', ('api', 'call', 'outcome'))
+SCRAPES = Counter('scrapes_total', 'Scraped urls by how they were served', ('outcome',))
+HTTP_REQUEST_SECONDS = Histogram('http_request_seconds', 'Time to handle API requests',
+                                 ('method', 'endpoint', 'status'))
+
+class Trace:
+    """Spans recorded for one request, from whichever threads work on it"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.stages = {}  # stage -> [count, total seconds]
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, started: float, elapsed: float, labels: Dict) -> None:
+        with self._lock:
+            totals = self.stages.setdefault(stage, [0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            if len(self.spans) < TRACE_MAX_SPANS:
+                span = {
+                    'stage': stage,
+                    'start_ms': round((started - self.started) * 1000, 1),
+                    'duration_ms': round(elapsed * 1000, 1)
+                }
+                span.update(labels)
+                self.spans.append(span)
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                'total_ms': round((time.perf_counter() - self.started) * 1000, 1),
+                'stages': {
+                    stage: {'count': count, 'total_ms': round(total * 1000, 1)}
+                    for stage, (count, total) in sorted(self.stages.items())
+                },
+                'spans': list(self.spans)
+            }
+
+_current_trace = contextvars.ContextVar('leadscraper_trace', default=None)
+
+def start_trace() -> Trace:
+    """Start recording spans for the current request; they land on the returned Trace"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+def stop_trace() -> None:
+    _current_trace.set(None)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def propagate(func):
+    """Wrap func so it runs with the caller's trace when handed to another thread"""
+    if _current_trace.get() is None:
+        return func
+    context = contextvars.copy_context()
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+@contextmanager
+def timed(stage: str, **labels) -> Iterator[None]:
+    """Time a block into stage_seconds, and into the request's trace when one is active"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, started, elapsed, labels)
@@ -0,0 +1,227 @@
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+from config import load_env
+
+load_env()
+
+# Worker processes for html parsing and contact extraction. Parsing is CPU-bound and holds
+# the GIL, so in a single process it serializes every scrape thread; fetches stay here.
+PARSE_POOL_ENABLED = os.getenv('PARSE_POOL_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+PARSE_POOL_WORKERS = int(os.getenv('PARSE_POOL_WORKERS', str(os.cpu_count() or 2)))
+PARSE_POOL_MAX_TASK_BYTES = int(os.getenv('PARSE_POOL_MAX_TASK_BYTES', str(2 * 1024 * 1024)))  # larger pages are cut
+PARSE_POOL_TIMEOUT = float(os.getenv('PARSE_POOL_TIMEOUT', '10'))  # seconds before a stuck worker is killed
+PARSE_POOL_MAX_TASKS_PER_WORKER = int(os.getenv('PARSE_POOL_MAX_TASKS_PER_WORKER', '500'))  # then it is replaced
+# Forking a process that already runs threads can copy held locks, so workers are spawned fresh
+PARSE_POOL_START_METHOD = os.getenv('PARSE_POOL_START_METHOD', 'spawn')
+CHECKOUT_POLL_INTERVAL = 0.25  # seconds between checks for a free slot while every worker is busy
+
+class ParseTimeout(Exception):
+    """Raised when a page takes longer than PARSE_POOL_TIMEOUT to parse; its worker is killed"""
+
+class ParseWorkerError(Exception):
+    """Raised when a worker process fails or dies while parsing a page"""
+
+def _worker_main(conn) -> None:
+    """Worker process loop: receive (page, url, encoding, link_base), send back ('ok', (result, links))"""
+    # Ctrl-C and shutdown signals are the parent's to handle; it stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Imported here since scraper imports this module
+    from scraper import extract_page
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task is None:
+            return
+        try:
+            conn.send(('ok', extract_page(*task)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {str(e)}"))
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name='parse-worker', daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+_idle = queue.LifoQueue()
+_lock = threading.Lock()
+_context = None
+_started = 0  # live workers, idle or busy
+_closed = False
+_stats = {'tasks': 0, 'timeouts': 0, 'errors': 0, 'crashes': 0, 'truncated': 0, 'workers_started': 0}
+
+def _start_worker() -> Optional[_Worker]:
+    """Start a worker if the pool is below PARSE_POOL_WORKERS, otherwise return None"""
+    global _context, _started
+    with _lock:
+        if _closed:
+            raise ParseWorkerError("Parse pool is shut down")
+        if _started >= max(1, PARSE_POOL_WORKERS):
+            return None
+        _started += 1
+        if _context is None:
+            _context = multiprocessing.get_context(PARSE_POOL_START_METHOD)
+
+    # Started outside the lock: a spawned interpreter takes a moment to come up
+    try:
+        worker = _Worker(_context)
+    except Exception:
+        with _lock:
+            _started -= 1
+        raise
+    with _lock:
+        _stats['workers_started'] += 1
+    return worker
+
+def _checkout() -> _Worker:
+    """
+    Take an idle worker, starting a new one while the pool is below PARSE_POOL_WORKERS.
+    A worker that is killed or recycled frees its slot without going back to the idle
+    queue, so waiters look again every CHECKOUT_POLL_INTERVAL and start a replacement.
+    Raises ParseWorkerError once the pool is shut down.
+    """
+    while True:
+        try:
+            return _idle.get_nowait()
+        except queue.Empty:
+            pass
+        worker = _start_worker()
+        if worker is not None:
+            return worker
+        try:
+            return _idle.get(timeout=CHECKOUT_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+
+def prestart() -> int:
+    """Start the whole pool now instead of on first use; returns how many workers were started"""
+    count = 0
+    while True:
+        worker = _start_worker()
+        if worker is None:
+            return count
+        _idle.put(worker)
+        count += 1
+
+def _release(worker: _Worker) -> None:
+    if _closed:
+        _discard(worker, graceful=True)
+    elif worker.tasks >= PARSE_POOL_MAX_TASKS_PER_WORKER > 0:
+        # Recycled now and then so memory fragmented by huge pages is given back
+        _discard(worker, graceful=True)
+        _replace()
+    else:
+        _idle.put(worker)
+
+def _discard(worker: _Worker, graceful: bool = False) -> None:
+    global _started
+    if graceful:
+        worker.stop()
+    else:
+        worker.kill()
+    with _lock:
+        _started -= 1
+
+def _replace() -> None:
+    """Start a worker in place of one that was discarded, so threads waiting for one get it"""
+    try:
+        worker = _start_worker()
+    except ParseWorkerError:
+        return  # shut down
+    except Exception as e:
+        # Waiters retry the start themselves on their next poll
+        print(f"Could not start a replacement parse worker: {str(e)}")
+        return
+    if worker is not None:
+        _idle.put(worker)
+
+def extract(page: Union[bytes, str], url: str, encoding: Optional[str] = None,
+            link_base: Optional[str] = None) -> Tuple[Dict, List[str]]:
+    """
+    Run scraper.extract_page in a worker process and return its (result, contact links).
+    Pages over PARSE_POOL_MAX_TASK_BYTES are cut to that size before they are sent.
+    Raises ParseTimeout if the worker takes longer than PARSE_POOL_TIMEOUT (the worker is
+    killed and replaced) and ParseWorkerError if it fails or dies.
+    """
+    if len(page) > PARSE_POOL_MAX_TASK_BYTES:
+        page = page[:PARSE_POOL_MAX_TASK_BYTES]
+        with _lock:
+            _stats['truncated'] += 1
+
+    worker = _checkout()
+    try:
+        worker.conn.send((page, url, encoding, link_base))
+        ready = worker.conn.poll(PARSE_POOL_TIMEOUT)
+        if ready:
+            status, value = worker.conn.recv()
+    except (EOFError, OSError) as e:
+        _discard(worker)
+        with _lock:
+            _stats['crashes'] += 1
+        _replace()
+        raise ParseWorkerError(f"Parse worker died: {str(e) or type(e).__name__}")
+    if not ready:
+        _discard(worker)
+        with _lock:
+            _stats['timeouts'] += 1
+        _replace()
+        raise ParseTimeout(f"Parsing took longer than {PARSE_POOL_TIMEOUT}s")
+
+    worker.tasks += 1
+    _release(worker)
+    with _lock:
+        _stats['tasks'] += 1
+        if status != 'ok':
+            _stats['errors'] += 1
+    if status != 'ok':
+        raise ParseWorkerError(value)
+    return value
+
+def shutdown() -> None:
+    """
+    Stop the idle workers; busy ones stop as soon as their current page is done.
+    Threads waiting for a worker get ParseWorkerError on their next poll.
+    """
+    global _closed
+    with _lock:
+        _closed = True
+    while True:
+        try:
+            worker = _idle.get_nowait()
+        except queue.Empty:
+            return
+        _discard(worker, graceful=True)
+
+def pool_stats() -> Dict:
+    """Get task, timeout and crash counters and the number of live workers"""
+    with _lock:
+        stats = dict(_stats)
+        stats['workers'] = _started
+    stats['enabled'] = PARSE_POOL_ENABLED
+    stats['idle_workers'] = _idle.qsize()
+    return stats
@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+from config import load_env
+from http_client import get_session
+
+load_env()
+
+# Per-domain fetch pacing
+POLITENESS_RATE = float(os.getenv('POLITENESS_RATE', '1.0'))  # requests per second per domain
+POLITENESS_BURST = float(os.getenv('POLITENESS_BURST', '2'))  # requests allowed back to back
+POLITENESS_MIN_RATE = float(os.getenv('POLITENESS_MIN_RATE', '0.05'))  # floor after repeated throttling
+POLITENESS_MAX_WAIT = float(os.getenv('POLITENESS_MAX_WAIT', '5'))  # longest a fetch may wait for its turn
+POLITENESS_RESPECT_ROBOTS = os.getenv('POLITENESS_RESPECT_ROBOTS', 'false').lower() in ('1', 'true', 'yes')
+ROBOTS_CACHE_TTL = int(os.getenv('ROBOTS_CACHE_TTL', '3600'))  # seconds
+POLITENESS_MAX_DOMAINS = 10000  # domain states kept before idle ones are dropped
+THROTTLE_STATUS_CODES = (429, 503)
+
+class DomainThrottled(Exception):
+    """Raised when a domain can't be fetched within POLITENESS_MAX_WAIT"""
+
+class _DomainState:
+    def __init__(self, rate: float):
+        self.lock = threading.Lock()
+        self.base_rate = rate
+        self.rate = rate
+        self.tokens = POLITENESS_BURST
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(POLITENESS_BURST, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+_domains = {}
+_domains_lock = threading.Lock()
+_robots = {}  # host -> (fetched_at, crawl_delay or None)
+_robots_lock = threading.Lock()
+
+def _domain_key(url: str) -> str:
+    return (urlparse(url).hostname or '').lower()
+
+def _robots_crawl_delay(url: str) -> Optional[float]:
+    """Get the robots.txt Crawl-delay for the url's host, cached for ROBOTS_CACHE_TTL"""
+    parts = urlparse(url)
+    host = parts.netloc.lower()
+    now = time.time()
+    with _robots_lock:
+        cached = _robots.get(host)
+        if cached and now - cached[0] < ROBOTS_CACHE_TTL:
+            return cached[1]
+
+    delay = None
+    try:
+        response = get_session().get(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout=5)
+        if response.status_code == 200:
+            parser = RobotFileParser()
+            parser.parse(response.text.splitlines())
+            user_agent = get_session().headers.get('User-Agent', '*')
+            delay = parser.crawl_delay(user_agent) or parser.crawl_delay('*')
+    except Exception as e:
+        print(f"Could not read robots.txt for {host}: {e}")
+
+    delay = float(delay) if delay else None
+    with _robots_lock:
+        _robots[host] = (now, delay)
+    return delay
+
+def _get_state(url: str) -> _DomainState:
+    key = _domain_key(url)
+    with _domains_lock:
+        state = _domains.get(key)
+        if state is not None:
+            return state
+
+    rate = POLITENESS_RATE
+    if POLITENESS_RESPECT_ROBOTS:
+        delay = _robots_crawl_delay(url)
+        if delay:
+            rate = min(rate, 1.0 / delay)
+
+    with _domains_lock:
+        if key not in _domains and len(_domains) >= POLITENESS_MAX_DOMAINS:
+            # Forget the half of the domains that were used least recently
+            idle = sorted(_domains, key=lambda host: _domains[host].updated_at)
+            for host in idle[:len(idle) // 2]:
+                del _domains[host]
+        return _domains.setdefault(key, _DomainState(rate))
+
+def acquire(url: str, max_wait: float = None) -> float:
+    """
+    Wait for the url's domain to allow another request. Returns seconds waited.
+    Raises DomainThrottled instead of waiting longer than max_wait, so one slow or
+    throttling host can't tie up a fetch worker.
+    """
+    max_wait = POLITENESS_MAX_WAIT if max_wait is None else max_wait
+    state = _get_state(url)
+    with state.lock:
+        now = time.monotonic()
+        state.refill(now)
+        wait = max(state.blocked_until - now, 0.0)
+        if state.tokens < 1:
+            wait = max(wait, (1 - state.tokens) / state.rate)
+        if wait > max_wait:
+            raise DomainThrottled(f"{_domain_key(url)} is throttled for another {wait:.1f}s")
+        # Reserve the token now so concurrent callers queue up behind this one
+        state.tokens -= 1
+        state.requests += 1
+
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def record_response(url: str, status_code: int, retry_after: str = None) -> None:
+    """
+    Adapt a domain's rate to how it responded: halve it and pause the domain on
+    429/503 (honoring Retry-After), and recover gradually on success.
+    """
+    state = _get_state(url)
+    with state.lock:
+        if status_code in THROTTLE_STATUS_CODES:
+            state.throttled += 1
+            state.rate = max(POLITENESS_MIN_RATE, state.rate / 2)
+            pause = _parse_retry_after(retry_after)
+            if pause is None:
+                pause = 1.0 / state.rate
+            state.blocked_until = max(state.blocked_until, time.monotonic() + pause)
+        elif status_code < 400 and state.rate < state.base_rate:
+            state.rate = min(state.base_rate, state.rate + state.base_rate * 0.1)
+
+def politeness_stats() -> Dict:
+    """Get per-domain rates for domains that have been slowed down"""
+    now = time.monotonic()
+    with _domains_lock:
+        states = dict(_domains)
+
+    throttled = {}
+    for host, state in states.items():
+        if state.throttled or state.rate < state.base_rate:
+            throttled[host] = {
+                'rate': round(state.rate, 3),
+                'base_rate': round(state.base_rate, 3),
+                'throttled_responses': state.throttled,
+                'blocked_for': round(max(state.blocked_until - now, 0.0), 1)
+            }
+    return {
+        'domains_tracked': len(states),
+        'requests': sum(state.requests for state in states.values()),
+        'throttled_domains': throttled
+    }
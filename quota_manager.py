@@ -1,10 +1,27 @@
-
 import json
 import os
+import sqlite3
+import threading
+import time
+import atexit
+from contextlib import contextmanager
 from datetime import datetime, date
 from typing import Tuple
+import metrics
+from config import load_env
+from db import connect_db
+
+load_env()
 
 USERS_FILE = 'users.json'
+QUOTA_DB_PATH = os.getenv('QUOTA_DB_PATH', 'users.db')
+
+# 'strict' runs every check and increment as a database transaction, which is what
+# multi-worker deployments need. 'cached' keeps counters in memory and flushes usage
+# deltas in batches; with several workers a user may briefly overrun by the unflushed amount.
+QUOTA_CONSISTENCY = os.getenv('QUOTA_CONSISTENCY', 'strict').lower()
+QUOTA_FLUSH_INTERVAL = float(os.getenv('QUOTA_FLUSH_INTERVAL', '5'))  # seconds
+QUOTA_CACHE_MAX_AGE = float(os.getenv('QUOTA_CACHE_MAX_AGE', '60'))  # seconds before a cached user is re-read
 
 # Plan configurations
 PLANS = {
@@ -15,137 +32,407 @@ PLANS = {
     'Ultimate': {'quota': 100, 'period': 'daily'}
 }
 
-def load_users() -> dict:
+QUOTA_DECISIONS = metrics.Counter('quota_decisions_total', 'consume_quota outcomes', ('result',))
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+def load_users(path: str = None) -> dict:
     """Load users data from JSON file"""
-    if not os.path.exists(USERS_FILE):
+    path = path or USERS_FILE
+    if not os.path.exists(path):
         return {}
-    
+
     try:
-        with open(USERS_FILE, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except (json.JSONDecodeError, FileNotFoundError):
         return {}
 
-def save_users(users_data: dict) -> None:
-    """Save users data to JSON file"""
-    with open(USERS_FILE, 'w') as f:
-        json.dump(users_data, f, indent=2)
+def _connect() -> sqlite3.Connection:
+    """Get this thread's connection to the quota database"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = connect_db(QUOTA_DB_PATH, shared=False)
+        conn.row_factory = sqlite3.Row
+        _local.conn = conn
+        _init_db(conn)
+    return conn
 
-def get_user_plan(email: str) -> str:
-    """Get user's plan name"""
-    users = load_users()
-    if email not in users:
-        return 'Free Trial'  # Default plan
-    return users[email].get('plan', 'Free Trial')
+def _init_db(conn: sqlite3.Connection) -> None:
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                email TEXT PRIMARY KEY,
+                plan TEXT NOT NULL,
+                used INTEGER NOT NULL DEFAULT 0,
+                quota INTEGER NOT NULL,
+                last_reset TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        imported = conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+        if imported is None:
+            import_users_from_json(conn=conn)
+        _initialized = True
 
-def reset_if_needed(email: str) -> None:
-    """Reset usage if quota period has passed"""
-    users = load_users()
-    
-    if email not in users:
-        # Create new user with default plan
-        users[email] = {
-            'plan': 'Free Trial',
-            'used': 0,
-            'quota': PLANS['Free Trial']['quota'],
-            'last_reset': str(date.today()),
-            'created_at': str(datetime.now())
-        }
-        save_users(users)
-        return
-    
-    user = users[email]
-    plan_name = user.get('plan', 'Free Trial')
-    plan_config = PLANS.get(plan_name, PLANS['Free Trial'])
-    
-    last_reset = user.get('last_reset', str(date.today()))
+def import_users_from_json(path: str = None, conn: sqlite3.Connection = None) -> int:
+    """
+    One-time import of users from the legacy users.json file.
+    Existing database rows win over the file. Returns the number of users imported.
+    """
+    conn = conn or _connect()
+    users = load_users(path)
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        imported = 0
+        for email, user in users.items():
+            plan_name = user.get('plan', 'Free Trial')
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO users (email, plan, used, quota, last_reset, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    email,
+                    plan_name,
+                    user.get('used', 0),
+                    user.get('quota', PLANS.get(plan_name, PLANS['Free Trial'])['quota']),
+                    user.get('last_reset', str(date.today())),
+                    user.get('created_at', str(datetime.now()))
+                )
+            )
+            imported += cursor.rowcount
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)", (str(datetime.now()),)
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+    if imported:
+        print(f"Imported {imported} users from {path or USERS_FILE} into {QUOTA_DB_PATH}")
+    return imported
+
+def _should_reset(user: dict) -> bool:
+    """Check if the user's quota period has passed"""
+    plan_config = PLANS.get(user['plan'], PLANS['Free Trial'])
+    last_reset = user['last_reset']
     current_date = str(date.today())
-    
-    should_reset = False
-    
+
     if plan_config['period'] == 'daily':
         # Reset daily
-        if last_reset != current_date:
-            should_reset = True
-    elif plan_config['period'] == 'monthly':
+        return last_reset != current_date
+    if plan_config['period'] == 'monthly':
         # Reset monthly
         try:
             last_reset_date = datetime.strptime(last_reset, '%Y-%m-%d').date()
             current_date_obj = date.today()
-            
-            if (last_reset_date.year != current_date_obj.year or 
-                last_reset_date.month != current_date_obj.month):
-                should_reset = True
+
+            return (last_reset_date.year != current_date_obj.year or
+                    last_reset_date.month != current_date_obj.month)
         except ValueError:
-            should_reset = True
-    
-    if should_reset:
+            return True
+    return False
+
+def _get_user_for_update(conn: sqlite3.Connection, email: str) -> dict:
+    """Load a user inside an open transaction, creating it and applying period resets as needed"""
+    row = conn.execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+
+    if row is None:
+        # Create new user with default plan
+        user = {
+            'email': email,
+            'plan': 'Free Trial',
+            'used': 0,
+            'quota': PLANS['Free Trial']['quota'],
+            'last_reset': str(date.today()),
+            'created_at': str(datetime.now())
+        }
+        conn.execute(
+            'INSERT INTO users (email, plan, used, quota, last_reset, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+            (email, user['plan'], user['used'], user['quota'], user['last_reset'], user['created_at'])
+        )
+        return user
+
+    user = dict(row)
+    if _should_reset(user):
+        plan_config = PLANS.get(user['plan'], PLANS['Free Trial'])
         user['used'] = 0
-        user['last_reset'] = current_date
+        user['last_reset'] = str(date.today())
         user['quota'] = plan_config['quota']
-        save_users(users)
+        conn.execute(
+            'UPDATE users SET used = ?, last_reset = ?, quota = ? WHERE email = ?',
+            (user['used'], user['last_reset'], user['quota'], email)
+        )
+    return user
+
+def _transaction(func):
+    """Run func(conn) in a write transaction, serialized across threads and processes"""
+    conn = _connect()
+    # Timed from BEGIN so time spent waiting on other writers' locks shows up
+    with metrics.timed('quota_transaction'):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(conn)
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+def _quota_message(user: dict) -> Tuple[bool, str]:
+    plan_name = user['plan']
+    used = user['used']
+    quota = user['quota']
+
+    if used >= quota:
+        return False, f"Quota exceeded. Please upgrade your plan. Current plan: {plan_name} ({used}/{quota} searches used)"
+
+    remaining = quota - used
+    return True, f"Search allowed. {remaining} searches remaining on {plan_name} plan"
+
+def _charge_decision(user: dict, amount: int) -> Tuple[bool, str]:
+    """Decide whether amount searches can be charged to user"""
+    if user['used'] + amount > user['quota'] and user['used'] < user['quota']:
+        remaining = user['quota'] - user['used']
+        return False, f"Quota exceeded. {amount} searches requested but only {remaining} remaining on {user['plan']} plan"
+    return _quota_message(user)
+
+# In-memory quota cache used when QUOTA_CONSISTENCY is 'cached'
+_cache = {}  # email -> {'user': dict, 'loaded_at': float}
+_pending = {}  # email -> usage delta not yet written to the database
+_cache_lock = threading.RLock()
+# Held by flushes and reloads, so a reload never reads the database while deltas are in flight.
+# Always taken before _cache_lock, never while holding it.
+_flush_lock = threading.RLock()
+_flusher = None
+
+def _cached_mode() -> bool:
+    return QUOTA_CONSISTENCY == 'cached'
+
+def _start_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(QUOTA_FLUSH_INTERVAL)
+            try:
+                flush_quota()
+            except Exception as e:
+                print(f"Quota flush failed, will retry: {e}")
+
+    _flusher = threading.Thread(target=run, name='quota-flusher', daemon=True)
+    _flusher.start()
+    atexit.register(flush_quota)
+
+def _fresh_entry(email: str):
+    """Get the cached entry for email if it is recent and its period hasn't ended (caller holds _cache_lock)"""
+    entry = _cache.get(email)
+    if entry is not None and time.time() - entry['loaded_at'] < QUOTA_CACHE_MAX_AGE:
+        if not _should_reset(entry['user']):
+            return entry
+    return None
+
+def _cached_user(email: str) -> dict:
+    """
+    Get a user from the cache, loading it once and applying period resets lazily.
+    The load and any reset run as a database transaction outside _cache_lock, so one user's
+    reload doesn't stall quota checks for everyone else.
+    """
+    with _cache_lock:
+        _start_flusher()
+        entry = _fresh_entry(email)
+        if entry is not None:
+            return entry['user']
+
+    with _flush_lock:
+        with _cache_lock:
+            # Another thread may have reloaded it while this one waited
+            entry = _fresh_entry(email)
+            if entry is not None:
+                return entry['user']
+        # Unflushed usage belongs to the period it was charged in, so write it before reloading
+        flush_quota()
+        user = _transaction(lambda conn: _get_user_for_update(conn, email))
+        with _cache_lock:
+            # Charged against the old entry since the flush and not yet in the database
+            user['used'] = max(user['used'] + _pending.get(email, 0), 0)
+            _cache[email] = {'user': user, 'loaded_at': time.time()}
+        return user
+
+@contextmanager
+def _locked_user(email: str):
+    """Hold _cache_lock on a user's current cache entry, so a check and a charge see the same counts"""
+    while True:
+        user = _cached_user(email)
+        with _cache_lock:
+            entry = _cache.get(email)
+            # Retry if a reload replaced the entry between the lookup and taking the lock
+            if entry is not None and entry['user'] is user:
+                yield user
+                return
+
+def _add_usage(user: dict, email: str, amount: int) -> None:
+    """Charge or refund a cached user and buffer the delta (caller holds _cache_lock)"""
+    user['used'] = max(user['used'] + amount, 0)
+    _pending[email] = _pending.get(email, 0) + amount
+
+def _cached_add_usage(email: str, amount: int) -> None:
+    with _locked_user(email) as user:
+        _add_usage(user, email, amount)
+
+def flush_quota() -> int:
+    """Write buffered usage deltas to the database in one transaction. Returns users flushed."""
+    with _flush_lock:
+        return _flush_pending()
+
+def _flush_pending() -> int:
+    with _cache_lock:
+        if not _pending:
+            return 0
+        pending = dict(_pending)
+        _pending.clear()
+
+    def write(conn):
+        for email, delta in pending.items():
+            conn.execute('UPDATE users SET used = MAX(used + ?, 0) WHERE email = ?', (delta, email))
+
+    try:
+        _transaction(write)
+    except Exception:
+        # Put the deltas back so the next flush retries them
+        with _cache_lock:
+            for email, delta in pending.items():
+                _pending[email] = _pending.get(email, 0) + delta
+        raise
+    return len(pending)
+
+def _invalidate(email: str) -> None:
+    """Flush buffered usage and drop email's cache entry (caller holds _flush_lock)"""
+    flush_quota()
+    with _cache_lock:
+        _cache.pop(email, None)
+
+def get_user_plan(email: str) -> str:
+    """Get user's plan name"""
+    if _cached_mode():
+        return _cached_user(email)['plan']
+
+    row = _connect().execute('SELECT plan FROM users WHERE email = ?', (email,)).fetchone()
+    if row is None:
+        return 'Free Trial'  # Default plan
+    return row['plan']
+
+def reset_if_needed(email: str) -> None:
+    """Reset usage if quota period has passed"""
+    if _cached_mode():
+        _cached_user(email)
+        return
+    _transaction(lambda conn: _get_user_for_update(conn, email))
 
 def check_quota(email: str) -> Tuple[bool, str]:
     """
     Check if user can perform a search
     Returns (can_search: bool, message: str)
     """
-    reset_if_needed(email)
-    
-    users = load_users()
-    user = users.get(email, {})
-    
-    plan_name = user.get('plan', 'Free Trial')
-    used = user.get('used', 0)
-    quota = user.get('quota', PLANS['Free Trial']['quota'])
-    
-    if used >= quota:
-        return False, f"Quota exceeded. Please upgrade your plan. Current plan: {plan_name} ({used}/{quota} searches used)"
-    
-    remaining = quota - used
-    return True, f"Search allowed. {remaining} searches remaining on {plan_name} plan"
+    if _cached_mode():
+        with _locked_user(email) as user:
+            return _quota_message(user)
+
+    user = _transaction(lambda conn: _get_user_for_update(conn, email))
+    return _quota_message(user)
+
+def consume_quota(email: str, amount: int = 1) -> Tuple[bool, str]:
+    """
+    Atomically check the quota and, if enough searches remain, charge amount of them.
+    Returns (charged: bool, message: str)
+    """
+    if _cached_mode():
+        with _locked_user(email) as user:
+            allowed, message = _charge_decision(user, amount)
+            if allowed:
+                _add_usage(user, email, amount)
+    else:
+        def consume(conn):
+            user = _get_user_for_update(conn, email)
+            allowed, message = _charge_decision(user, amount)
+            if allowed:
+                conn.execute('UPDATE users SET used = used + ? WHERE email = ?', (amount, email))
+            return allowed, message
+
+        allowed, message = _transaction(consume)
+
+    QUOTA_DECISIONS.inc(result='charged' if allowed else 'denied')
+    return allowed, message
+
+def refund_usage(email: str, amount: int = 1) -> None:
+    """Give back searches charged by consume_quota for a search that failed"""
+    if _cached_mode():
+        _cached_add_usage(email, -amount)
+        return
+
+    _transaction(lambda conn: conn.execute(
+        'UPDATE users SET used = MAX(used - ?, 0) WHERE email = ?', (amount, email)
+    ))
 
 def increment_usage(email: str) -> None:
     """Increment user's usage count by 1"""
-    users = load_users()
-    
-    if email not in users:
-        reset_if_needed(email)  # This will create the user
-        users = load_users()
-    
-    users[email]['used'] = users[email].get('used', 0) + 1
-    save_users(users)
+    if _cached_mode():
+        _cached_add_usage(email, 1)
+        return
+
+    def increment(conn):
+        if conn.execute('SELECT 1 FROM users WHERE email = ?', (email,)).fetchone() is None:
+            _get_user_for_update(conn, email)  # This will create the user
+        conn.execute('UPDATE users SET used = used + 1 WHERE email = ?', (email,))
+
+    _transaction(increment)
 
 def update_user_plan(email: str, new_plan: str) -> bool:
     """Update user's plan"""
     if new_plan not in PLANS:
         return False
-    
-    users = load_users()
-    
-    if email not in users:
-        reset_if_needed(email)  # Create user first
-        users = load_users()
-    
-    # Update plan and reset quota
-    users[email]['plan'] = new_plan
-    users[email]['quota'] = PLANS[new_plan]['quota']
-    users[email]['used'] = 0  # Reset usage when upgrading
-    users[email]['last_reset'] = str(date.today())
-    
-    save_users(users)
+
+    def update(conn):
+        _get_user_for_update(conn, email)  # Create user first
+
+        # Update plan and reset quota
+        conn.execute(
+            'UPDATE users SET plan = ?, quota = ?, used = 0, last_reset = ? WHERE email = ?',
+            (new_plan, PLANS[new_plan]['quota'], str(date.today()), email)
+        )
+
+    # Plan changes are rare, so they always go straight to the database. In cached mode no
+    # reload can run between dropping the entry and the update, or it would cache the old plan.
+    if _cached_mode():
+        with _flush_lock:
+            _invalidate(email)
+            _transaction(update)
+    else:
+        _transaction(update)
     return True
 
 # Utility function for testing
 def get_user_status(email: str) -> dict:
     """Get complete user status"""
-    users = load_users()
-    user = users.get(email, {})
-    
+    if _cached_mode():
+        with _locked_user(email) as cached:
+            user = dict(cached)
+    else:
+        row = _connect().execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
+        user = dict(row) if row else {}
+
     plan_name = user.get('plan', 'Free Trial')
     used = user.get('used', 0)
     quota = user.get('quota', PLANS['Free Trial']['quota'])
-    
+
     return {
         'email': email,
         'plan': plan_name,
@@ -0,0 +1,136 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from config import load_env
+from db import connect_db
+from url_utils import normalize_url
+
+load_env()
+
+# On-disk cache of extraction results, keyed by normalized URL
+SCRAPE_CACHE_ENABLED = os.getenv('SCRAPE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+SCRAPE_CACHE_PATH = os.getenv('SCRAPE_CACHE_PATH', 'scrape_cache.db')
+SCRAPE_CACHE_TTL = int(os.getenv('SCRAPE_CACHE_TTL', str(3 * 24 * 3600)))  # seconds
+SCRAPE_CACHE_MAX_ENTRIES = int(os.getenv('SCRAPE_CACHE_MAX_ENTRIES', '20000'))
+SCRAPE_CACHE_MAX_BYTES = int(os.getenv('SCRAPE_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+
+_conn = None
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'stale': 0, 'revalidated': 0, 'stores': 0, 'evictions': 0}
+
+def _get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = connect_db(SCRAPE_CACHE_PATH)
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_cache (
+                url TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        _conn.execute('CREATE INDEX IF NOT EXISTS idx_scrape_cache_accessed ON scrape_cache (accessed_at)')
+    return _conn
+
+def lookup(url: str) -> Optional[Dict]:
+    """
+    Look up a cached extraction result.
+    Returns None on a miss, otherwise a dict with 'result', 'etag', 'last_modified'
+    and 'fresh' (False once the TTL has passed and the entry needs revalidating).
+    """
+    key = normalize_url(url)
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        row = conn.execute(
+            'SELECT result, etag, last_modified, fetched_at FROM scrape_cache WHERE url = ?', (key,)
+        ).fetchone()
+        if row is None:
+            _stats['misses'] += 1
+            return None
+
+        conn.execute('UPDATE scrape_cache SET accessed_at = ? WHERE url = ?', (now, key))
+        fresh = now - row[3] < SCRAPE_CACHE_TTL
+        _stats['hits' if fresh else 'stale'] += 1
+
+    result = json.loads(row[0])
+    result['url'] = url
+    return {
+        'result': result,
+        'etag': row[1],
+        'last_modified': row[2],
+        'fresh': fresh
+    }
+
+def conditional_headers(entry: Dict) -> Dict:
+    """Build revalidation headers for a stale cache entry"""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+def mark_revalidated(url: str) -> None:
+    """Restart the TTL of an entry after the server answered 304 Not Modified"""
+    now = time.time()
+    with _lock:
+        _get_conn().execute(
+            'UPDATE scrape_cache SET fetched_at = ?, accessed_at = ? WHERE url = ?',
+            (now, now, normalize_url(url))
+        )
+        _stats['revalidated'] += 1
+
+def store(url: str, result: Dict, etag: str = None, last_modified: str = None) -> None:
+    """Cache an extraction result along with the validators the server sent"""
+    payload = json.dumps(result)
+    now = time.time()
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO scrape_cache (url, result, etag, last_modified, fetched_at, accessed_at, size) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (normalize_url(url), payload, etag, last_modified, now, now, len(payload))
+        )
+        _stats['stores'] += 1
+        _evict(conn)
+
+def _evict(conn: sqlite3.Connection) -> None:
+    """Drop least recently used entries until the cache fits its entry and size limits"""
+    count, total_size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scrape_cache').fetchone()
+    if count <= SCRAPE_CACHE_MAX_ENTRIES and total_size <= SCRAPE_CACHE_MAX_BYTES:
+        return
+
+    excess = max(count - SCRAPE_CACHE_MAX_ENTRIES, 0)
+    if total_size > SCRAPE_CACHE_MAX_BYTES and count:
+        # Evict roughly enough average-sized entries to get back under the byte limit
+        average = total_size / count
+        excess = max(excess, int((total_size - SCRAPE_CACHE_MAX_BYTES) / average) + 1)
+
+    cursor = conn.execute(
+        'DELETE FROM scrape_cache WHERE url IN '
+        '(SELECT url FROM scrape_cache ORDER BY accessed_at ASC LIMIT ?)',
+        (excess,)
+    )
+    _stats['evictions'] += cursor.rowcount
+
+def cache_stats() -> Dict:
+    """Get hit/miss counters and current cache size"""
+    with _lock:
+        stats = dict(_stats)
+        if _conn is not None:
+            stats['entries'], stats['bytes'] = _conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM scrape_cache'
+            ).fetchone()
+
+    lookups = stats['hits'] + stats['misses'] + stats['stale']
+    stats['enabled'] = SCRAPE_CACHE_ENABLED
+    stats['hit_ratio'] = round((stats['hits'] + stats['revalidated']) / lookups, 3) if lookups else 0.0
+    return stats
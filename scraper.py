@@ -1,16 +1,63 @@
-import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 import re
 import os
-from typing import List, Dict
-from dotenv import load_dotenv
-from urllib.parse import urlparse
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from typing import List, Dict, Iterable, Iterator, Tuple, Callable, Optional, Union
+from config import load_env
+from urllib.parse import urlparse, urljoin, urldefrag
+from http_client import get_session
+from url_utils import normalize_url, normalize_domain
+import scrape_cache
+import politeness
+import search_cache
+import domain_health
+import dedup_index
+import metrics
+import parse_pool
 
-load_dotenv()
+load_env()
 
-def create_google_dork(niche: str, location: str) -> str:
+# Concurrency limits for fetching search results
+SCRAPE_MAX_WORKERS = int(os.getenv('SCRAPE_MAX_WORKERS', '10'))
+SCRAPE_PER_HOST_LIMIT = int(os.getenv('SCRAPE_PER_HOST_LIMIT', '2'))
+
+# Idle host semaphores are dropped automatically once no fetch holds them
+_host_semaphores = weakref.WeakValueDictionary()
+_host_semaphores_lock = threading.Lock()
+
+# Download guards for scraped pages
+SCRAPE_MAX_BYTES = int(os.getenv('SCRAPE_MAX_BYTES', str(2 * 1024 * 1024)))
+SCRAPE_CHUNK_SIZE = 16 * 1024
+SCRAPE_STOP_AT_FOOTER = os.getenv('SCRAPE_STOP_AT_FOOTER', 'false').lower() in ('1', 'true', 'yes')
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+FOOTER_END_MARKERS = (b'</footer', b'</body')
+
+# Same-domain crawl of contact/about pages when the landing page has no contact info
+SCRAPE_CRAWL_ENABLED = os.getenv('SCRAPE_CRAWL_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+SCRAPE_CRAWL_MAX_PAGES = int(os.getenv('SCRAPE_CRAWL_MAX_PAGES', '3'))  # extra pages per site
+SCRAPE_CRAWL_TIME_BUDGET = float(os.getenv('SCRAPE_CRAWL_TIME_BUDGET', '10'))  # seconds per site
+CONTACT_PATH_HINTS = ('contact', 'about', 'reach-us', 'get-in-touch', 'location')
+CONTACT_TEXT_PATTERN = re.compile(r'contact|reach us|get in touch|about', re.IGNORECASE)
+
+# Fan-out search: extra query variants and result pages to fill target_count in one request
+SEARCH_FANOUT = os.getenv('SEARCH_FANOUT', 'false').lower() in ('1', 'true', 'yes')
+SEARCH_FANOUT_PAGES = int(os.getenv('SEARCH_FANOUT_PAGES', '3'))  # result pages of the main dork
+SEARCH_FANOUT_WORKERS = int(os.getenv('SEARCH_FANOUT_WORKERS', '4'))
+SEARCH_FANOUT_TIMEOUT = float(os.getenv('SEARCH_FANOUT_TIMEOUT', '8'))  # seconds extra variants may take
+SEARCH_SITE_FILTERS = ('.in', '.com')
+SERPER_API_URL = os.getenv('SERPER_API_URL', 'https://google.serper.dev/search')
+SERPER_TIMEOUT = float(os.getenv('SERPER_TIMEOUT', '15'))  # seconds per Serper request
+
+# Bulk searches: Serper queries run at once for one /scrape/bulk request
+BULK_SEARCH_WORKERS = int(os.getenv('BULK_SEARCH_WORKERS', '8'))
+
+def create_google_dork(niche: str, location: str, sites: Tuple[str, ...] = SEARCH_SITE_FILTERS) -> str:
+    site_clause = ' OR '.join(f'site:{site}' for site in sites)
     return (
-        f'"{niche}" "{location}" site:.in OR site:.com '
+        f'"{niche}" "{location}" {site_clause} '
         '-site:zomato.com -site:swiggy.com -site:justdial.com '
         '-site:tripadvisor.com -site:facebook.com -site:instagram.com '
         '-inurl:"/search" -inurl:"/tag/" -inurl:"/categories/" -intitle:"menu"'
@@ -22,37 +69,133 @@ def is_real_business_site(url):
     junk_sites = ['youtube.com', 'facebook.com', 'instagram.com', 'twitter.com', 'linkedin.com']
     return not any(junk in domain for junk in junk_sites)
 
-def extract_contact_info(html_content: str, url: str) -> Dict:
-    soup = BeautifulSoup(html_content, 'lxml')
+COMMON_SPAM_DOMAINS = ['example.com', 'test.com', 'dummy.com', 'noreply', 'support', 'info']
+
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+PHONE_PATTERNS = [
+    r'\+91[-\s]?[6-9]\d{9}',
+    r'91[-\s]?[6-9]\d{9}',
+    r'[6-9]\d{9}',
+    r'\([0-9]{3}\)[-\s]?[0-9]{3}[-\s]?[0-9]{4}'
+]
+SOCIAL_PATTERN = r'https?://(?:www\.)?(?:facebook|instagram)\.com/[^\s<>"]*'
+
+# One scanner for every text pattern. The leading lookahead only stops at positions where
+# some pattern matches; the optional lookaheads then report which patterns match there.
+# Matches are zero-width so overlapping matches of different patterns are all seen.
+_TEXT_PATTERNS = [EMAIL_PATTERN] + PHONE_PATTERNS
+_CONTACT_SCANNER = re.compile(
+    '(?=' + '|'.join(f'(?:{p})' for p in _TEXT_PATTERNS) + ')'
+    + ''.join(f'(?:(?=({p})))?' for p in _TEXT_PATTERNS)
+)
+_REPEATED_DIGITS = re.compile(r'(\d)\1{5,}')
+_SOCIAL_SCANNER = re.compile(SOCIAL_PATTERN)
+
+class _TextCollector:
+    """
+    lxml parser target that collects page text without building a tree.
+    Mirrors BeautifulSoup(html, 'lxml').get_text(): script/style/template contents and
+    comments are dropped, and whitespace-only strings outside <pre>/<textarea>
+    collapse to a single newline or space.
+    """
+    HIDDEN_TAGS = {'script', 'style', 'template'}
+    PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+    ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+    def __init__(self):
+        self.parts = []
+        self.current = []
+        self.hidden_depth = 0
+        self.preserve_depth = 0
+
+    def _flush(self):
+        if not self.current:
+            return
+        data = ''.join(self.current)
+        self.current = []
+        if self.hidden_depth:
+            return
+        if not self.preserve_depth and not data.strip(self.ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        self.parts.append(data)
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in self.HIDDEN_TAGS:
+            self.hidden_depth += 1
+        if tag in self.PRESERVE_WHITESPACE_TAGS:
+            self.preserve_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if tag in self.HIDDEN_TAGS and self.hidden_depth:
+            self.hidden_depth -= 1
+        if tag in self.PRESERVE_WHITESPACE_TAGS and self.preserve_depth:
+            self.preserve_depth -= 1
 
-    text = soup.get_text()
+    def data(self, data):
+        self.current.append(data)
 
-    common_spam_domains = ['example.com', 'test.com', 'dummy.com', 'noreply', 'support', 'info']
+    def comment(self, text):
+        self._flush()
+
+    def doctype(self, *args):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return ''.join(self.parts)
+
+def html_to_text(html_content: str) -> str:
+    """Strip tags from html with lxml's event parser, matching BeautifulSoup's get_text()"""
+    if html_content[:1] == '\ufeff':
+        html_content = html_content[1:]
+    try:
+        parser = etree.HTMLParser(target=_TextCollector(), recover=True, strip_cdata=False)
+        parser.feed(html_content)
+        return parser.close()
+    except (UnicodeDecodeError, LookupError, etree.ParserError):
+        # Same fallback BeautifulSoup uses when lxml rejects the unicode markup
+        parser = etree.HTMLParser(target=_TextCollector(), recover=True, strip_cdata=False, encoding='utf8')
+        parser.feed(html_content.encode('utf8'))
+        return parser.close()
+
+def _scan_text(text: str) -> List[List[str]]:
+    """Run every text pattern in one pass, returning re.findall-equivalent matches per pattern"""
+    matches = [[] for _ in _TEXT_PATTERNS]
+    next_allowed = [0] * len(_TEXT_PATTERNS)
+    for match in _CONTACT_SCANNER.finditer(text):
+        position = match.start()
+        for index, value in enumerate(match.groups()):
+            # findall never returns overlapping matches of the same pattern
+            if value is not None and position >= next_allowed[index]:
+                matches[index].append(value)
+                next_allowed[index] = position + len(value)
+    return matches
+
+def extract_contact_info(html_content: str, url: str) -> Dict:
+    text = html_to_text(html_content)
+
+    email_matches, *phone_matches = _scan_text(text)
 
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
     emails = list(set(
-        email for email in re.findall(email_pattern, text)
-        if not any(bad in email.lower() for bad in common_spam_domains)
+        email for email in email_matches
+        if not any(bad in email.lower() for bad in COMMON_SPAM_DOMAINS)
     ))
 
-    phone_patterns = [
-        r'\+91[-\s]?[6-9]\d{9}',
-        r'91[-\s]?[6-9]\d{9}',
-        r'[6-9]\d{9}',
-        r'\([0-9]{3}\)[-\s]?[0-9]{3}[-\s]?[0-9]{4}'
-    ]
-
     phones = []
-    for pattern in phone_patterns:
-        phones.extend(re.findall(pattern, text))
+    for pattern_matches in phone_matches:
+        phones.extend(pattern_matches)
 
     cleaned_phones = list(set([
         phone for phone in phones 
-        if len(phone) >= 10 and not re.match(r'(\d)\1{5,}', phone)
+        if len(phone) >= 10 and not _REPEATED_DIGITS.match(phone)
     ]))
 
-    social_pattern = r'https?://(?:www\.)?(?:facebook|instagram)\.com/[^\s<>"]*'
-    social_links = list(set(re.findall(social_pattern, html_content)))
+    social_links = list(set(_SOCIAL_SCANNER.findall(html_content)))
 
     return {
         'url': url,
@@ -64,24 +207,278 @@ def extract_contact_info(html_content: str, url: str) -> Dict:
         }
     }
 
+def extract_page(page: Union[bytes, str], url: str, encoding: Optional[str] = None,
+                 link_base: Optional[str] = None) -> Tuple[Dict, List[str]]:
+    """
+    Decode a downloaded page and extract its contact info.
+    With link_base, a page without contact info also gets its likely contact/about
+    links (see find_contact_links); otherwise the links list is empty.
+    """
+    html_content = decode_bytes(page, encoding) if isinstance(page, bytes) else page
+    result = extract_contact_info(html_content, url)
+    links = find_contact_links(html_content, link_base) if link_base and not _has_contact_info(result) else []
+    return result, links
+
+def parse_page(page: Union[bytes, str], url: str, encoding: Optional[str] = None,
+               link_base: Optional[str] = None) -> Tuple[Dict, List[str]]:
+    """extract_page, run in the parse worker processes when PARSE_POOL_ENABLED is set"""
+    if parse_pool.PARSE_POOL_ENABLED:
+        return parse_pool.extract(page, url, encoding, link_base)
+    return extract_page(page, url, encoding, link_base)
+
+class _LinkCollector:
+    """lxml parser target that collects (href, anchor text) for every <a> tag"""
+
+    def __init__(self):
+        self.links = []
+        self.current_href = None
+        self.current_text = []
+
+    def start(self, tag, attrib):
+        if tag == 'a':
+            self.current_href = attrib.get('href')
+            self.current_text = []
+
+    def end(self, tag):
+        if tag == 'a' and self.current_href is not None:
+            self.links.append((self.current_href, ' '.join(''.join(self.current_text).split())))
+            self.current_href = None
+
+    def data(self, data):
+        if self.current_href is not None:
+            self.current_text.append(data)
+
+    def close(self):
+        return self.links
+
+def _site_host(url: str) -> str:
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+def find_contact_links(html_content: str, base_url: str, limit: int = None) -> List[str]:
+    """Find same-domain links that likely lead to contact details, best candidates first"""
+    limit = SCRAPE_CRAWL_MAX_PAGES if limit is None else limit
+    parser = etree.HTMLParser(target=_LinkCollector(), recover=True)
+    try:
+        parser.feed(html_content)
+        links = parser.close()
+    except (UnicodeDecodeError, LookupError, etree.ParserError):
+        return []
+
+    site = _site_host(base_url)
+    base = urldefrag(base_url)[0]
+    candidates = {}
+    for href, text in links:
+        href = (href or '').strip()
+        if not href or href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+            continue
+        link = urldefrag(urljoin(base_url, href))[0]
+        if not link.startswith(('http://', 'https://')) or link == base or _site_host(link) != site:
+            continue
+
+        path = urlparse(link).path.lower()
+        score = 0
+        if 'contact' in path:
+            score += 3
+        elif any(hint in path for hint in CONTACT_PATH_HINTS):
+            score += 2
+        if text and CONTACT_TEXT_PATTERN.search(text):
+            score += 2 if 'contact' in text.lower() else 1
+        if score and score > candidates.get(link, 0):
+            candidates[link] = score
+
+    ranked = sorted(candidates, key=lambda link: -candidates[link])
+    return ranked[:limit]
+
+def fetch_page(url: str, timeout: float = 15) -> Optional[str]:
+    """Fetch a page's html with the download guards, or None if it isn't html"""
+    politeness.acquire(url)
+    timeout = min(timeout, domain_health.timeout_for(url))
+    with get_session().get(url, timeout=timeout, stream=True) as response:
+        politeness.record_response(url, response.status_code, response.headers.get('Retry-After'))
+        response.raise_for_status()
+        if not is_html_response(response):
+            return None
+        return decode_body(read_capped_body(response), response)
+
+def _has_contact_info(result: Dict) -> bool:
+    return bool(result.get('emails') or result.get('phones'))
+
+def _merge_contact_info(result: Dict, extra: Dict) -> None:
+    """Add contact details found on another page of the same site to result"""
+    for key in ('emails', 'phones'):
+        for value in extra.get(key, []):
+            if value not in result[key]:
+                result[key].append(value)
+    for platform, links in extra.get('social_links', {}).items():
+        existing = result['social_links'].setdefault(platform, [])
+        for link in links:
+            if link not in existing:
+                existing.append(link)
+
+def crawl_contact_pages(result: Dict, links: List[str], base_url: str) -> Dict:
+    """
+    Fetch the site's likely contact/about pages (from find_contact_links) concurrently and
+    merge what they contain. Bounded by SCRAPE_CRAWL_MAX_PAGES and SCRAPE_CRAWL_TIME_BUDGET;
+    stops at the first page that yields an email or phone number.
+    """
+    if not links:
+        return result
+
+    deadline = time.monotonic() + SCRAPE_CRAWL_TIME_BUDGET
+    executor = ThreadPoolExecutor(max_workers=len(links), thread_name_prefix='crawl')
+    futures = {
+        executor.submit(fetch_page, link, min(15, SCRAPE_CRAWL_TIME_BUDGET)): link
+        for link in links
+    }
+    try:
+        for future in as_completed(futures, timeout=max(0, deadline - time.monotonic())):
+            link = futures[future]
+            try:
+                page_html = future.result()
+            except Exception as e:
+                print(f"Error crawling {link}: {str(e)}")
+                continue
+            if page_html is None:
+                continue
+
+            try:
+                page_result, _ = parse_page(page_html, link)
+            except Exception as e:
+                print(f"Error parsing {link}: {str(e)}")
+                continue
+            _merge_contact_info(result, page_result)
+            if _has_contact_info(result):
+                print(f"Found contact info on {link}")
+                break
+    except FuturesTimeoutError:
+        print(f"Crawl budget used up for {base_url}")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return result
+
+def is_html_response(response) -> bool:
+    """Check the Content-Type header; pages that don't send one are given the benefit of the doubt"""
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+def read_capped_body(response, max_bytes: int = None, stop_at_footer: bool = None) -> bytes:
+    """
+    Read a streamed response body in chunks, stopping at max_bytes.
+    With stop_at_footer the download also ends once the closing footer/body tag has
+    arrived, since contact details live in or before the footer.
+    """
+    max_bytes = SCRAPE_MAX_BYTES if max_bytes is None else max_bytes
+    stop_at_footer = SCRAPE_STOP_AT_FOOTER if stop_at_footer is None else stop_at_footer
+
+    chunks = []
+    size = 0
+    tail = b''
+    for chunk in response.iter_content(chunk_size=SCRAPE_CHUNK_SIZE):
+        if not chunk:
+            continue
+        chunk = chunk[:max_bytes - size]
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+        if stop_at_footer:
+            # Keep a little of the previous chunk so markers split across chunks are found
+            window = (tail + chunk).lower()
+            if any(marker in window for marker in FOOTER_END_MARKERS):
+                break
+            tail = window[-8:]
+
+    return b''.join(chunks)
+
+def decode_body(body: bytes, response) -> str:
+    """Decode a capped body; truncation may split a character, so undecodable bytes are replaced"""
+    return decode_bytes(body, response.encoding)
+
+def decode_bytes(body: bytes, encoding: Optional[str] = None) -> str:
+    try:
+        return body.decode(encoding or 'utf-8', errors='replace')
+    except LookupError:
+        # Unknown charset in the Content-Type header
+        return body.decode('utf-8', errors='replace')
+
 def scrape_url(url: str) -> Dict:
     try:
         if not is_real_business_site(url):
             print("Skipping social media site:", url)
             return {}
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+        cached = scrape_cache.lookup(url) if scrape_cache.SCRAPE_CACHE_ENABLED else None
+        if cached and cached['fresh']:
+            metrics.SCRAPES.inc(outcome='cache_hit')
+            return cached['result']
 
-        response = requests.get(url, headers=headers, timeout=15)  # Increased timeout
-        response.raise_for_status()
+        # Expired entries are revalidated so an unchanged page costs neither download nor parse
+        headers = scrape_cache.conditional_headers(cached) if cached else {}
+
+        # Domains that keep timing out or refusing connections are skipped for a while
+        if not domain_health.allow(url):
+            print(f"Skipping unhealthy domain: {url}")
+            metrics.SCRAPES.inc(outcome='unhealthy_domain')
+            return cached['result'] if cached else {}
+
+        # Wait for this domain's turn; hosts that are throttling us are skipped, not waited on
+        try:
+            politeness.acquire(url)
+        except politeness.DomainThrottled as e:
+            print(f"Skipping throttled domain: {url} ({e})")
+            metrics.SCRAPES.inc(outcome='throttled')
+            domain_health.release_probe(url)
+            return {}
 
-        # Extract contact info from any business site
-        return extract_contact_info(response.text, url)
+        # Pooled session sends the browser User-Agent and reuses keep-alive connections;
+        # the timeout shrinks for domains known to answer quickly
+        started = time.monotonic()
+        with metrics.timed('fetch', url=url), \
+                get_session().get(url, headers=headers, timeout=domain_health.timeout_for(url), stream=True) as response:
+            politeness.record_response(url, response.status_code, response.headers.get('Retry-After'))
+            if response.status_code < 500:
+                domain_health.record_success(url, time.monotonic() - started)
+            if cached and response.status_code == 304:
+                scrape_cache.mark_revalidated(url)
+                metrics.SCRAPES.inc(outcome='revalidated')
+                return cached['result']
+
+            response.raise_for_status()
+
+            if not is_html_response(response):
+                print(f"Skipping non-HTML content ({response.headers.get('Content-Type')}):", url)
+                metrics.SCRAPES.inc(outcome='not_html')
+                return {}
+
+            body = read_capped_body(response)
+            metrics.PAGE_BYTES.observe(len(body))
+            encoding = response.encoding
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            final_url = response.url or url
+
+        # Extract contact info from any business site; the raw bytes go to a parse worker
+        # process when the pool is enabled
+        with metrics.timed('parse', url=url):
+            result, contact_links = parse_page(body, url, encoding,
+                                               link_base=final_url if SCRAPE_CRAWL_ENABLED else None)
+
+        # Landing page came up empty: look on the site's contact/about pages
+        if contact_links:
+            with metrics.timed('crawl', url=url):
+                result = crawl_contact_pages(result, contact_links, final_url)
+
+        if scrape_cache.SCRAPE_CACHE_ENABLED:
+            scrape_cache.store(url, result, etag, last_modified)
+        metrics.SCRAPES.inc(outcome='fetched')
+        return result
 
     except Exception as e:
         print(f"Error scraping {url}: {str(e)}")
+        metrics.SCRAPES.inc(outcome='error')
+        domain_health.record_failure(url, e)
         # Still return the URL data even if scraping fails
         return {
             'url': url,
@@ -91,22 +488,136 @@ def scrape_url(url: str) -> Dict:
             'error': str(e)
         }
 
-def search_with_serper(query: str) -> List[str]:
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    """Get the semaphore limiting concurrent fetches to the url's host"""
+    host = urlparse(url).netloc.lower()
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(max(1, SCRAPE_PER_HOST_LIMIT))
+            _host_semaphores[host] = semaphore
+        return semaphore
+
+def _scrape_with_host_limit(url: str, stop_event: threading.Event,
+                            cancel: Optional[threading.Event] = None) -> Dict:
+    if stop_event.is_set() or (cancel is not None and cancel.is_set()):
+        return {}
+    with _host_semaphore(url):
+        # The batch may have finished, or been cancelled, while we waited for the host slot
+        if stop_event.is_set() or (cancel is not None and cancel.is_set()):
+            return {}
+        return scrape_url(url)
+
+def iter_scrape_urls(urls: Iterable[str], max_workers: int = None,
+                     cancel: Optional[threading.Event] = None,
+                     needed: Optional[Callable[[], int]] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    Scrape urls concurrently, yielding (url, scraped_data) in input order.
+    needed() says how many more results the caller still wants; no more fetches are started
+    while that many are already in flight. Closing the generator cancels fetches that have
+    not started yet. Once cancel is set, no more urls are taken and queued fetches come back empty.
+    """
+    max_workers = max(1, max_workers or SCRAPE_MAX_WORKERS)
+    url_iter = iter(urls)
+    stop_event = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape')
+
+    pending = {}   # index -> (url, future)
+    next_submit = 0
+    next_yield = 0
+    exhausted = False
+
+    try:
+        while True:
+            # Keep a bounded window of fetches in flight so urls are consumed lazily
+            while not exhausted and len(pending) < max_workers * 2:
+                # Fetches already in flight can cover what is left, so don't start more yet
+                if needed is not None and len(pending) >= needed():
+                    break
+                if cancel is not None and cancel.is_set():
+                    exhausted = True
+                    break
+                try:
+                    url = next(url_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = executor.submit(metrics.propagate(_scrape_with_host_limit), url, stop_event, cancel)
+                pending[next_submit] = (url, future)
+                next_submit += 1
+
+            if next_yield not in pending:
+                return
+
+            url, future = pending.pop(next_yield)
+            next_yield += 1
+            yield url, future.result()
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_scrape_results(urls: Iterable[str], target_count: int, max_workers: int = None,
+                        progress: Optional[Callable[[int, int], None]] = None,
+                        accept: Optional[Callable[[Dict], bool]] = None,
+                        deadline: Optional[float] = None,
+                        cancel: Optional[threading.Event] = None) -> Iterator[Dict]:
+    """
+    Scrape urls concurrently, yielding usable results in url order as soon as each is ready.
+    Stops after target_count results; progress(done, target) is called after each one.
+    Results that accept(result) rejects don't count towards target_count.
+    With a deadline (a time.monotonic() value), stops early once it passes, and likewise
+    once cancel is set.
+    """
+    if target_count <= 0:
+        return
+
+    count = 0
+    scraped = iter_scrape_urls(urls, max_workers=max_workers, cancel=cancel,
+                               needed=lambda: target_count - count)
+    try:
+        for url, scraped_data in scraped:
+            # Accept any result that has data or even just a URL
+            if scraped_data and scraped_data.get('url') and (accept is None or accept(scraped_data)):
+                count += 1
+                print(f"Scraped: {url} (Result {count}/{target_count})")
+                if progress:
+                    progress(count, target_count)
+                yield scraped_data
+            if count >= target_count:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"Time limit reached after {count}/{target_count} results")
+                break
+            if cancel is not None and cancel.is_set():
+                print(f"Cancelled after {count}/{target_count} results")
+                break
+    finally:
+        scraped.close()
+
+def search_with_serper(query: str, page: int = 1) -> List[str]:
     api_key = os.getenv('SERPER_API_KEY')
     if not api_key:
         raise ValueError("SERPER_API_KEY not found in environment variables")
 
-    url = "https://google.serper.dev/search"
+    url = SERPER_API_URL
     payload = {
         'q': query,
         'num': 50  # Request more results to account for filtering
     }
+    if page > 1:
+        payload['page'] = page
     headers = {
         'X-API-KEY': api_key,
         'Content-Type': 'application/json'
     }
 
-    response = requests.post(url, json=payload, headers=headers)
+    with metrics.timed('serper_search', query=query, page=page):
+        try:
+            response = get_session().post(url, json=payload, headers=headers, timeout=SERPER_TIMEOUT)
+        except Exception:
+            metrics.API_CALLS.inc(api='serper', call='search', outcome='error')
+            raise
+    metrics.API_CALLS.inc(api='serper', call='search', outcome=response.status_code)
     response.raise_for_status()
 
     data = response.json()
@@ -118,32 +629,205 @@ def search_with_serper(query: str) -> List[str]:
 
     return urls[:50]  # Return more URLs to process
 
-def search_and_scrape(niche: str, location: str) -> List[Dict]:
+def search_serper_cached(niche: str, location: str) -> List[str]:
+    """Search Serper for the niche/location dork, reusing recent results for the same search"""
+    query = create_google_dork(niche, location)
+    key = search_cache.normalize_search_key(niche, location)
+    return search_cache.get_or_search(key, lambda: search_with_serper(query))
+
+def build_search_variants(niche: str, location: str, localities: Optional[List[str]] = None,
+                          pages: int = None) -> List[Tuple[str, int, tuple]]:
+    """
+    Build the fan-out queries as (query, page, cache_key), highest priority first:
+    the main dork, one dork per site: filter, further pages of the main dork,
+    then the main dork for each nearby locality.
+    """
+    pages = SEARCH_FANOUT_PAGES if pages is None else pages
+    key = search_cache.normalize_search_key(niche, location)
+    # The first variant shares its cache entry with the plain, single-query search
+    variants = [(create_google_dork(niche, location), 1, key)]
+    if len(SEARCH_SITE_FILTERS) > 1:
+        for site in SEARCH_SITE_FILTERS:
+            variants.append((create_google_dork(niche, location, sites=(site,)), 1, key + (f'site:{site}', 1)))
+    for page in range(2, pages + 1):
+        variants.append((create_google_dork(niche, location), page, key + ('', page)))
+    for locality in localities or []:
+        if locality and locality.strip():
+            variants.append((create_google_dork(niche, locality), 1, search_cache.normalize_search_key(niche, locality)))
+    return variants
+
+def iter_fanout_search(niche: str, location: str, localities: Optional[List[str]] = None) -> Iterator[str]:
+    """
+    Run every search variant concurrently and yield their urls merged in priority order,
+    without repeats. The main dork's urls are yielded as soon as it returns; the other
+    variants get SEARCH_FANOUT_TIMEOUT seconds from the start, and any that fail or run
+    late are skipped. A failure of the main dork is raised.
+    """
+    variants = build_search_variants(niche, location, localities)
+    print(f"Fanning out over {len(variants)} search variants")
+    deadline = time.monotonic() + SEARCH_FANOUT_TIMEOUT
+    executor = ThreadPoolExecutor(max_workers=max(1, min(SEARCH_FANOUT_WORKERS, len(variants))))
+    futures = [
+        executor.submit(metrics.propagate(search_cache.get_or_search), cache_key,
+                        lambda query=query, page=page: search_with_serper(query, page))
+        for query, page, cache_key in variants
+    ]
+    seen = set()
     try:
-        query = create_google_dork(niche, location)
-        print(f"Searching for: {query}")
+        for index, future in enumerate(futures):
+            if index == 0:
+                urls = future.result()
+            else:
+                try:
+                    urls = future.result(timeout=max(deadline - time.monotonic(), 0))
+                except FuturesTimeoutError:
+                    print(f"Search variant timed out: {variants[index][0]} (page {variants[index][1]})")
+                    continue
+                except Exception as e:
+                    print(f"Search variant failed: {variants[index][0]} (page {variants[index][1]}): {str(e)}")
+                    continue
 
-        urls = search_with_serper(query)
+            for url in urls:
+                key = normalize_url(url)
+                if key not in seen:
+                    seen.add(key)
+                    yield url
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def iter_search_and_scrape(niche: str, location: str, target_count: int = 30,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           email: Optional[str] = None, fanout: Optional[bool] = None,
+                           localities: Optional[List[str]] = None,
+                           deadline: Optional[float] = None,
+                           cancel: Optional[threading.Event] = None) -> Iterator[Dict]:
+    """
+    Search for the niche/location and yield scraped results as each URL finishes.
+    Each site is fetched once per search however many of its urls come back, and
+    results repeating an earlier result's contacts are dropped.
+    With fanout, several query variants are searched and their urls are scraped as
+    they arrive, so the later variants are only waited on if the target isn't met yet.
+    A deadline (time.monotonic() value) or setting cancel ends the run early with the results so far.
+    """
+    query = create_google_dork(niche, location)
+    print(f"Searching for: {query}")
+
+    if SEARCH_FANOUT if fanout is None else fanout:
+        urls = iter_fanout_search(niche, location, localities)
+    else:
+        urls = search_serper_cached(niche, location)
         print(f"Found {len(urls)} URLs")
 
-        results = []
-        target_count = 30
-        
-        for url in urls:
-            if len(results) >= target_count:
-                break
-                
-            print(f"Scraping: {url} (Result {len(results)+1}/{target_count})")
-            scraped_data = scrape_url(url)
-            
-            # Accept any result that has data or even just a URL
+    if progress:
+        progress(0, target_count)
+
+    dedup = dedup_index.RunDeduper(email)
+    count = 0
+    for result in iter_scrape_results(dedup.unique_urls(urls), target_count,
+                                      progress=progress, accept=dedup.accept, deadline=deadline,
+                                      cancel=cancel):
+        count += 1
+        yield result
+
+    print(f"Collected {count} results")
+
+def bulk_search_and_scrape(pairs: List[Tuple[str, str]], target_count: int = 30, email: Optional[str] = None,
+                           progress: Optional[Callable[[int, int], None]] = None,
+                           deadline: Optional[float] = None,
+                           cancel: Optional[threading.Event] = None) -> List[Dict]:
+    """
+    Search and scrape several niche/location pairs together.
+    The searches run concurrently, and their urls share one fetch pool in which each
+    site is fetched once, however many pairs found it; its result goes to each of them.
+    Sites are queued round-robin across the pairs so they all fill up at the same pace,
+    and sites only pairs that already have target_count results want are skipped.
+    A deadline (time.monotonic() value) or setting cancel ends the run early with the results so far.
+    Returns one {'niche', 'location', 'results', 'error'} per pair, in order.
+    """
+    outcomes = [{'niche': niche, 'location': location, 'results': [], 'error': None} for niche, location in pairs]
+    if not pairs:
+        return outcomes
+
+    with ThreadPoolExecutor(max_workers=max(1, min(BULK_SEARCH_WORKERS, len(pairs)))) as executor:
+        futures = [executor.submit(metrics.propagate(search_serper_cached), niche, location) for niche, location in pairs]
+    url_lists = []
+    for outcome, future in zip(outcomes, futures):
+        try:
+            url_lists.append(future.result())
+        except Exception as e:
+            print(f"Search failed for {outcome['niche']} / {outcome['location']}: {str(e)}")
+            outcome['error'] = str(e)
+            url_lists.append([])
+
+    # Map each site to the first url seen for it and every pair whose results include it
+    sites = {}  # domain -> (url, [pair indexes])
+    order = []
+    for position in range(max(len(urls) for urls in url_lists)):
+        for index, urls in enumerate(url_lists):
+            if position >= len(urls):
+                continue
+            domain = normalize_domain(urls[position])
+            if domain not in sites:
+                sites[domain] = (urls[position], [])
+                order.append(domain)
+            if index not in sites[domain][1]:
+                sites[domain][1].append(index)
+    print(f"Bulk search: {len(pairs)} searches, {sum(map(len, url_lists))} URLs, {len(sites)} distinct sites")
+
+    def wanted(domain: str) -> bool:
+        return any(len(outcomes[index]['results']) < target_count for index in sites[domain][1])
+
+    def iter_site_urls() -> Iterator[str]:
+        for domain in order:
+            if wanted(domain):
+                yield sites[domain][0]
+
+    dedupers = [dedup_index.RunDeduper(email) for _ in pairs]
+    total_target = target_count * sum(1 for outcome in outcomes if outcome['error'] is None)
+    done = 0
+    if progress:
+        progress(0, total_target)
+
+    def needed() -> int:
+        return sum(max(target_count - len(outcome['results']), 0) for outcome in outcomes if outcome['error'] is None)
+
+    scraped = iter_scrape_urls(iter_site_urls(), cancel=cancel, needed=needed)
+    try:
+        for url, scraped_data in scraped:
             if scraped_data and scraped_data.get('url'):
-                results.append(scraped_data)
-            
-        print(f"Collected {len(results)} results")
+                for index in sites[normalize_domain(url)][1]:
+                    results = outcomes[index]['results']
+                    # Each pair gets its own copy; dedup may flag it for that customer
+                    item = dict(scraped_data)
+                    if len(results) < target_count and dedupers[index].accept(item):
+                        results.append(item)
+                        done += 1
+                        if progress:
+                            progress(done, total_target)
+            if all(len(outcome['results']) >= target_count for outcome in outcomes if outcome['error'] is None):
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"Time limit reached after {done}/{total_target} bulk results")
+                break
+            if cancel is not None and cancel.is_set():
+                print(f"Cancelled after {done}/{total_target} bulk results")
+                break
+    finally:
+        scraped.close()
+
+    print(f"Bulk search collected {done} results")
+    return outcomes
+
+def search_and_scrape(niche: str, location: str,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      email: Optional[str] = None, fanout: Optional[bool] = None,
+                      localities: Optional[List[str]] = None) -> List[Dict]:
+    try:
+        target_count = 30
+        results = list(iter_search_and_scrape(niche, location, target_count, progress=progress, email=email,
+                                              fanout=fanout, localities=localities))
         return results[:target_count]  # Ensure exactly 30 or less
 
     except Exception as e:
         print(f"Error in search_and_scrape: {str(e)}")
         raise
-
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+from config import load_env
+
+load_env()
+
+# In-process cache of Serper search results
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', '3600'))  # seconds
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '1000'))
+
+_entries = OrderedDict()  # key -> (stored_at, urls), least recently used first
+_inflight = {}  # key -> Future for searches currently running
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+def normalize_search_key(niche: str, location: str) -> Tuple[str, str]:
+    """Case-fold and collapse whitespace so equivalent searches share a cache entry"""
+    return (' '.join(niche.split()).casefold(), ' '.join(location.split()).casefold())
+
+def get_or_search(key: tuple, search: Callable[[], List[str]]) -> List[str]:
+    """
+    Return cached urls for key, or run search() to fill the cache.
+    Concurrent callers asking for the same key wait on a single search instead of
+    each making their own API call. Failed searches are not cached.
+    """
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            stored_at, urls = entry
+            if time.time() - stored_at < SEARCH_CACHE_TTL:
+                _entries.move_to_end(key)
+                _stats['hits'] += 1
+                return list(urls)
+            del _entries[key]
+
+        future = _inflight.get(key)
+        if future is not None:
+            _stats['coalesced'] += 1
+            leader = False
+        else:
+            future = Future()
+            _inflight[key] = future
+            _stats['misses'] += 1
+            leader = True
+
+    if not leader:
+        return list(future.result())
+
+    try:
+        urls = search()
+    except BaseException as e:
+        with _lock:
+            del _inflight[key]
+        future.set_exception(e)
+        raise
+
+    with _lock:
+        del _inflight[key]
+        _entries[key] = (time.time(), list(urls))
+        _entries.move_to_end(key)
+        while len(_entries) > SEARCH_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats['evictions'] += 1
+    future.set_result(urls)
+    return list(urls)
+
+def cache_stats() -> Dict:
+    """Get hit/miss/coalesced counters for the search cache"""
+    with _lock:
+        stats = dict(_stats)
+        stats['entries'] = len(_entries)
+        stats['inflight'] = len(_inflight)
+    return stats
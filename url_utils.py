@@ -0,0 +1,36 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for use as a cache key.
+    Lowercases scheme and host, drops default ports and fragments, and sorts query parameters.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or '').lower()
+        port = parts.port
+    except ValueError:
+        return url.strip()
+
+    netloc = host
+    if port and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{host}:{port}"
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+def normalize_domain(url: str) -> str:
+    """
+    Normalize a URL to the site it belongs to, for deduplicating leads.
+    Scheme, port, path and a leading www. are dropped, so http/https and www/non-www
+    variants of one site map to the same key.
+    """
+    try:
+        host = (urlsplit(url.strip()).hostname or '').lower()
+    except ValueError:
+        return ''
+    host = host.rstrip('.')
+    return host[4:] if host.startswith('www.') else host
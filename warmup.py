@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from typing import Dict
+from config import load_env
+
+load_env()
+
+# Background warm-up once the server is listening, so the first scrape after a cold start
+# doesn't pay for heavy imports, Google authorization and TLS handshakes
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+WARMUP_PAGE = b'<html><body><a href="/contact">Contact us</a><p>hello@warmup.test +91 9876543210</p></body></html>'
+
+_lock = threading.Lock()
+_thread = None
+_status = {'state': 'idle', 'started_at': None, 'finished_at': None, 'steps': {}}
+
+def _load_extractor() -> None:
+    """Import the scraper stack and run the extractor once, so lxml and the contact regexes are ready"""
+    import scraper
+    scraper.extract_page(WARMUP_PAGE, 'http://warmup.test/', link_base='http://warmup.test/')
+
+def _start_parse_workers() -> None:
+    import parse_pool
+    if parse_pool.PARSE_POOL_ENABLED:
+        parse_pool.prestart()
+
+def _open_serper_connection() -> None:
+    """Open a keep-alive connection to the Serper host in the shared pool"""
+    import scraper
+    from http_client import get_session
+    # Whatever the answer, the TLS handshake is done and the connection stays pooled
+    get_session().head(scraper.SERPER_API_URL, timeout=5)
+
+def _open_spreadsheet() -> None:
+    """Authorize the Sheets client and open the results spreadsheet"""
+    from google_sheets import get_spreadsheet
+    get_spreadsheet()
+
+WARMUP_STEPS = [
+    ('extractor', _load_extractor),
+    ('parse_pool', _start_parse_workers),
+    ('serper_connection', _open_serper_connection),
+    ('sheets_client', _open_spreadsheet)
+]
+
+def warm_up() -> Dict:
+    """Run every warm-up step, timing each; a failed step is recorded and the rest still run"""
+    with _lock:
+        _status.update(state='running', started_at=time.time(), steps={})
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+            outcome = {'seconds': round(time.perf_counter() - started, 3)}
+        except Exception as e:
+            print(f"Warm-up step {name} failed: {str(e)}")
+            outcome = {'seconds': round(time.perf_counter() - started, 3), 'error': str(e)}
+        with _lock:
+            _status['steps'][name] = outcome
+    with _lock:
+        _status.update(state='done', finished_at=time.time())
+        total = round(_status['finished_at'] - _status['started_at'], 3)
+    print(f"Warm-up finished in {total}s")
+    return warmup_status()
+
+def start_warmup() -> bool:
+    """Run warm_up on a background thread, once per process; returns False if it already started"""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return False
+        _thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+    _thread.start()
+    return True
+
+def wait_for_warmup(timeout: float = None) -> bool:
+    """Wait for a started warm-up to finish; returns False if it is still running"""
+    thread = _thread
+    if thread is not None:
+        thread.join(timeout)
+        return not thread.is_alive()
+    return True
+
+def warmup_status() -> Dict:
+    """Get the warm-up state and per-step timings"""
+    with _lock:
+        status = dict(_status, steps=dict(_status['steps']))
+    status['enabled'] = WARMUP_ENABLED
+    return status